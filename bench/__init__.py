@@ -0,0 +1 @@
+"""Benchmarks for geris against local stand-ins for Gitea and OpenAI"""
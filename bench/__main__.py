@@ -0,0 +1,4 @@
+# Internal
+from .run import main
+
+main()
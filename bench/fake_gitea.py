@@ -0,0 +1,435 @@
+# Stdlib
+import functools
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+EPOCH = "2025-01-01T00:00:00Z"
+LOGIN = "bench"
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 drops connection bursts, and the 1s SYN
+    # retransmit that follows would swamp the timings
+    request_queue_size = 1024
+
+
+class FakeGitea:
+    """Synthetic Gitea API: orgs, repos, issues, PRs, labels and milestones at scale
+
+    Everything is derived from the repo index and seed, so a repo's data
+    is generated on demand and 10,000 repos cost no more memory than 10.
+    Writes are kept in a small overlay on top. Every request sleeps for
+    latency plus up to jitter seconds and is counted per route. Like
+    Gitea, pages hold at most max_items whatever limit asks for, and
+    total_count turns the X-Total-Count header off for servers without it."""
+
+    def __init__(
+        self,
+        repos=100,
+        orgs=None,
+        issues=20,
+        prs=3,
+        milestones=2,
+        labels=5,
+        latency=0.0,
+        jitter=0.0,
+        search=True,
+        seed=0,
+        max_items=50,
+        total_count=True,
+    ):
+        self.repos = repos
+        self.orgs = orgs or max(1, repos // 20)
+        self.issues = issues
+        self.prs = prs
+        self.milestones = milestones
+        self.labels = labels
+        self.latency = latency
+        self.jitter = jitter
+        self.search = search
+        self.seed = seed
+        self.max_items = max_items
+        self.total_count = total_count
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._created = {}
+        self._edited = {}
+        self._server = None
+
+    # -- data -------------------------------------------------------------
+
+    def owner(self, i) -> str:
+        # every fifth repo is the user's own, the rest spread over the orgs
+        return LOGIN if i % 5 == 0 else f"org{i % self.orgs}"
+
+    def user(self, login, uid=1) -> dict:
+        return {
+            "id": uid,
+            "login": login,
+            "full_name": login.title(),
+            "email": f"{login}@example.com",
+            "avatar_url": "",
+            "is_admin": login == LOGIN,
+            "created": EPOCH,
+        }
+
+    @functools.lru_cache(maxsize=None)
+    def repo(self, i) -> dict:
+        owner = self.owner(i)
+        return {
+            "id": i + 1,
+            "name": f"repo{i}",
+            "full_name": f"{owner}/repo{i}",
+            "owner": self.user(owner, 1 if owner == LOGIN else 1000 + i % self.orgs),
+            "description": f"Synthetic repository {i}",
+            "private": i % 3 == 0,
+            "fork": False,
+            "archived": False,
+            "open_issues_count": self.issues,
+            "html_url": f"https://gitea.invalid/{owner}/repo{i}",
+            "created_at": EPOCH,
+            "updated_at": EPOCH,
+        }
+
+    def index(self, owner, name):
+        m = re.fullmatch(r"repo(\d+)", name)
+        if m is None or int(m[1]) >= self.repos or self.owner(int(m[1])) != owner:
+            return None
+        return int(m[1])
+
+    @functools.lru_cache(maxsize=2048)
+    def _base(self, i) -> tuple:
+        rnd = random.Random(self.seed * 1_000_003 + i)
+        labels = [
+            {
+                "id": i * 100 + n,
+                "name": f"Kind/{k}",
+                "color": "ee0701",
+                "description": "",
+            }
+            for n, k in enumerate(["Bug", "Feature", "Docs", "Chore", "Security"])
+        ][: self.labels]
+        labels += [
+            {
+                "id": i * 100 + n,
+                "name": f"Label{n}",
+                "color": "cccccc",
+                "description": "",
+            }
+            for n in range(len(labels), self.labels)
+        ]
+        milestones = [
+            {
+                "id": i * 100 + n,
+                "title": f"v{n + 1}.0",
+                "description": "",
+                "state": "open",
+                "open_issues": 0,
+                "closed_issues": 0,
+                "due_on": EPOCH,
+            }
+            for n in range(self.milestones)
+        ]
+        issues = []
+        for n in range(self.issues + self.prs):
+            pull = n >= self.issues
+            issues.append(
+                {
+                    "id": i * 100_000 + n,
+                    "number": n + 1,
+                    "title": f"{'PR' if pull else 'Issue'} {n + 1} in repo{i}: "
+                    + rnd.choice(
+                        ["crash on start", "slow dashboard", "typo", "add export"]
+                    ),
+                    "body": "Synthetic body. " * rnd.randint(1, 20),
+                    "state": "open" if pull or rnd.random() < 0.7 else "closed",
+                    "user": self.user(LOGIN),
+                    "assignee": None,
+                    "assignees": [],
+                    "labels": rnd.sample(labels, min(len(labels), rnd.randint(0, 2))),
+                    "milestone": (
+                        rnd.choice(milestones + [None]) if milestones else None
+                    ),
+                    "comments": rnd.randint(0, 10),
+                    "created_at": EPOCH,
+                    "updated_at": EPOCH,
+                    "pull_request": {"merged": False} if pull else None,
+                    "html_url": f"https://gitea.invalid/{self.repo(i)['full_name']}/issues/{n + 1}",
+                }
+            )
+        return labels, milestones, issues
+
+    def data(self, i) -> tuple:
+        labels, milestones, issues = self._base(i)
+        with self._lock:
+            issues = [dict(n, **self._edited.get((i, n["number"]), {})) for n in issues]
+            issues += self._created.get(i, [])
+        return labels, milestones, issues
+
+    def as_pull(self, i, issue) -> dict:
+        """A PR as /pulls returns it, rather than as the issue listings do"""
+        retv = {k: v for k, v in issue.items() if k != "pull_request"}
+        branch = {"repo": {k: self.repo(i)[k] for k in ("id", "name", "full_name")}}
+        retv.update(
+            head=dict(branch, ref=f"feature-{issue['number']}"),
+            base=dict(branch, ref="main"),
+            mergeable=True,
+            merged=issue["pull_request"]["merged"],
+        )
+        return retv
+
+    def as_edit(self, milestones, body) -> dict:
+        """Issue fields for a PATCH body, milestone and assignees as objects"""
+        retv = {
+            k: v
+            for k, v in body.items()
+            if k in ("title", "body", "state", "due_date", "ref")
+        }
+        if "milestone" in body:
+            retv["milestone"] = next(
+                (n for n in milestones if n["id"] == body["milestone"]), None
+            )
+        logins = body.get("assignees", None)
+        if logins is None and body.get("assignee", None) is not None:
+            logins = [body["assignee"]] if body["assignee"] else []
+        if logins is not None:
+            retv["assignees"] = [
+                self.user(n, 1 if n == LOGIN else 2000 + k)
+                for k, n in enumerate(logins)
+            ]
+            retv["assignee"] = retv["assignees"][0] if logins else None
+        return retv
+
+    def with_repo(self, i, items) -> list:
+        meta = {k: self.repo(i)[k] for k in ("id", "name", "full_name")}
+        meta["owner"] = self.repo(i)["owner"]["login"]
+        return [dict(n, repository=meta) for n in items]
+
+    # -- routing ----------------------------------------------------------
+
+    def route(self, method, path, query, body):
+        """(status, payload, paged) for one API call; lists are paged unless paged is False"""
+        state = query.get("state", "open")
+
+        def by_state(items):
+            return [n for n in items if state == "all" or n["state"] == state]
+
+        if method == "GET":
+            if path == "/version":
+                return 200, {"version": "1.21.0"}, None
+            if path == "/user":
+                return 200, self.user(LOGIN), None
+            if path == "/user/subscriptions":
+                return 200, [self.repo(i) for i in range(self.repos)], None
+            if path == "/admin/users":
+                return 200, [self.user(f"user{n}", n + 2) for n in range(50)], None
+            if path == "/admin/orgs":
+                return (
+                    200,
+                    [
+                        {"id": 1000 + n, "username": f"org{n}", "full_name": f"Org {n}"}
+                        for n in range(self.orgs)
+                    ],
+                    None,
+                )
+            m = re.fullmatch(r"/users/([^/]+)/repos", path)
+            if m:
+                return (
+                    200,
+                    [self.repo(i) for i in range(self.repos) if self.owner(i) == m[1]],
+                    None,
+                )
+            m = re.fullmatch(r"/users/([^/]+)/heatmap", path)
+            if m:
+                now = int(time.time())
+                return (
+                    200,
+                    [
+                        {"timestamp": now - 86400 * d, "contributions": d % 5}
+                        for d in range(0, 365, 2)
+                    ],
+                    # like Gitea, the heatmap comes whole
+                    False,
+                )
+            if path == "/repos/issues/search":
+                if not self.search:
+                    return 404, {"message": "not found"}, None
+                owner = query.get("owner", None)
+                pulls = query.get("type", None) == "pulls"
+                items = []
+                for i in range(self.repos):
+                    if owner and self.owner(i) != owner:
+                        continue
+                    found = [
+                        n
+                        for n in by_state(self.data(i)[2])
+                        if bool(n["pull_request"]) == pulls
+                    ]
+                    items += self.with_repo(i, found)
+                return 200, items, None
+
+        m = re.fullmatch(r"/repos/([^/]+)/([^/]+)(/.*)?", path)
+        i = self.index(m[1], m[2]) if m else None
+        if i is None:
+            return 404, {"message": "not found"}, None
+        labels, milestones, issues = self.data(i)
+        rest = m[3] or ""
+
+        if method == "GET":
+            if rest == "/issues":
+                kind = query.get("type", None)
+                items = [
+                    n
+                    for n in by_state(issues)
+                    if kind is None or (kind == "pulls") == bool(n["pull_request"])
+                ]
+                return 200, self.with_repo(i, items), None
+            if rest == "/pulls":
+                return (
+                    200,
+                    [self.as_pull(i, n) for n in by_state(issues) if n["pull_request"]],
+                    None,
+                )
+            if rest == "/labels":
+                return 200, labels, None
+            if rest == "/milestones":
+                return 200, by_state(milestones), None
+            m = re.fullmatch(r"/(labels|milestones)/(\d+)", rest)
+            if m:
+                for n in labels if m[1] == "labels" else milestones:
+                    if n["id"] == int(m[2]):
+                        return 200, n, None
+                return 404, {"message": "not found"}, None
+            m = re.fullmatch(r"/issues/(\d+)(/labels)?", rest)
+            if m and 0 < int(m[1]) <= len(issues):
+                issue = issues[int(m[1]) - 1]
+                return 200, issue["labels"] if m[2] else issue, None
+
+        if method == "POST" and rest == "/issues":
+            issue = dict(
+                issues[0] if issues else {},
+                number=len(issues) + 1,
+                id=i * 100_000 + len(issues),
+                title=body.get("title", ""),
+                body=body.get("body", ""),
+                state="open",
+                labels=[
+                    n for n in labels if n["id"] in (body.get("labels", None) or [])
+                ],
+                pull_request=None,
+            )
+            with self._lock:
+                self._created.setdefault(i, []).append(issue)
+            return 201, issue, None
+        if method == "POST" and rest == "/labels":
+            return 201, dict(body, id=i * 100 + 99, url=""), None
+        if method == "POST" and rest == "/milestones":
+            return 201, dict(body, id=i * 100 + 98, state="open"), None
+        m = re.fullmatch(r"/issues/(\d+)(/labels)?", rest)
+        if m and 0 < int(m[1]) <= len(issues):
+            if method == "PATCH" and not m[2]:
+                edit = self.as_edit(milestones, body)
+                with self._lock:
+                    self._edited.setdefault((i, int(m[1])), {}).update(edit)
+                return 201, dict(issues[int(m[1]) - 1], **edit), None
+            if method == "POST" and m[2]:
+                return (
+                    200,
+                    [n for n in labels if n["id"] in body.get("labels", [])],
+                    None,
+                )
+        if method == "DELETE":
+            return 204, None, None
+        return 404, {"message": "not found"}, None
+
+    # -- server -----------------------------------------------------------
+
+    def start(self, port=0) -> str:
+        """Serve on localhost in a daemon thread, returning the base URL"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body in one segment, or delayed ACKs add 40ms a request
+            wbufsize = 1 << 16
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self, method):
+                url = urlparse(self.path)
+                path = (
+                    url.path[len("/api/v1") :]
+                    if url.path.startswith("/api/v1")
+                    else url.path
+                )
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                size = int(self.headers.get("Content-Length", None) or 0)
+                body = json.loads(self.rfile.read(size) or b"{}") if size else {}
+                with fake._lock:
+                    fake.requests[
+                        f"{method} {re.sub(r'/repo[0-9]+|/[0-9]+', '/*', path)}"
+                    ] += 1
+                if fake.latency or fake.jitter:
+                    time.sleep(fake.latency + random.uniform(0, fake.jitter))
+
+                status, payload, paged = fake.route(method, path, query, body)
+                headers = {}
+                if isinstance(payload, list) and paged is not False:
+                    if fake.total_count:
+                        headers["X-Total-Count"] = str(len(payload))
+                    page = max(int(query.get("page", 1)), 1)
+                    limit = min(max(int(query.get("limit", 30)), 1), fake.max_items)
+                    payload = payload[(page - 1) * limit : page * limit]
+                data = b"" if payload is None else json.dumps(payload).encode()
+                etag = '"' + hashlib.md5(data).hexdigest() + '"'
+                if method == "GET" and status == 200:
+                    headers["ETag"] = etag
+                    if self.headers.get("If-None-Match", None) == etag:
+                        status, data = 304, b""
+
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_PATCH(self):
+                self._handle("PATCH")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+        self._server = Server(("127.0.0.1", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests.clear()
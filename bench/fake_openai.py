@@ -0,0 +1,160 @@
+# Stdlib
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+# Internal
+from .fake_gitea import Server
+
+# what the assistant does for a prompt the script doesn't know
+FALLBACK = [{"content": "Nothing scripted for that prompt."}]
+
+
+class FakeOpenAI:
+    """Scripted chat-completions endpoint
+
+    script maps a prompt to the steps the assistant takes for it; a step is
+    either {"tool_calls": [(name, arguments), ...]} or {"content": text}.
+    The step to answer with is picked by how many assistant messages follow
+    the last user message, so a turn replays the same sequence every time.
+    think is the delay before the first byte, token the delay per streamed
+    chunk, which together stand in for model latency."""
+
+    def __init__(self, script, think=0.0, token=0.0, chunk=16):
+        self.script = script
+        self.think = think
+        self.token = token
+        self.chunk = chunk
+        self.requests = 0
+        self.tools_offered = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def step(self, messages) -> dict:
+        last = max(i for i, m in enumerate(messages) if m["role"] == "user")
+        steps = self.script.get(messages[last]["content"], FALLBACK)
+        done = sum(1 for m in messages[last:] if m["role"] == "assistant")
+        return steps[min(done, len(steps) - 1)]
+
+    def message(self, step) -> dict:
+        if "content" in step:
+            return {"role": "assistant", "content": step["content"]}
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{next(self._ids)}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(args)},
+                }
+                for name, args in step["tool_calls"]
+            ],
+        }
+
+    def deltas(self, message):
+        """The streamed form of message, as the API splits it into chunks"""
+        yield {"role": "assistant"}
+        text = message["content"] or ""
+        for i in range(0, len(text), self.chunk):
+            yield {"content": text[i : i + self.chunk]}
+        for n, call in enumerate(message.get("tool_calls", None) or []):
+            yield {
+                "tool_calls": [
+                    {
+                        "index": n,
+                        "id": call["id"],
+                        "type": "function",
+                        "function": {"name": call["function"]["name"], "arguments": ""},
+                    }
+                ]
+            }
+            args = call["function"]["arguments"]
+            for i in range(0, len(args), self.chunk):
+                yield {
+                    "tool_calls": [
+                        {
+                            "index": n,
+                            "function": {"arguments": args[i : i + self.chunk]},
+                        }
+                    ]
+                }
+
+    def start(self, port=0) -> str:
+        """Serve on localhost in a daemon thread, returning the API base URL"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body in one segment, or delayed ACKs add 40ms a request
+            wbufsize = 1 << 16
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, data, ctype="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                size = int(self.headers.get("Content-Length", None) or 0)
+                req = json.loads(self.rfile.read(size) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send(404, b'{"error": {"message": "not found"}}')
+                    return
+                with fake._lock:
+                    fake.requests += 1
+                    fake.tools_offered.append(len(req.get("tools", None) or []))
+                message = fake.message(fake.step(req["messages"]))
+                reason = "tool_calls" if message.get("tool_calls") else "stop"
+                head = {
+                    "id": f"chatcmpl-{fake.requests}",
+                    "created": int(time.time()),
+                    "model": req.get("model", "bench"),
+                }
+                time.sleep(fake.think)
+
+                if not req.get("stream", False):
+                    body = dict(
+                        head,
+                        object="chat.completion",
+                        choices=[
+                            {"index": 0, "message": message, "finish_reason": reason}
+                        ],
+                        usage={"prompt_tokens": 0, "completion_tokens": 0},
+                    )
+                    self._send(200, json.dumps(body).encode())
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                chunks = [(d, None) for d in fake.deltas(message)] + [({}, reason)]
+                for delta, finish in chunks:
+                    chunk = dict(
+                        head,
+                        object="chat.completion.chunk",
+                        choices=[{"index": 0, "delta": delta, "finish_reason": finish}],
+                    )
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(fake.token)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        self._server = Server(("127.0.0.1", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,375 @@
+# Stdlib
+import argparse
+import asyncio
+import configparser
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 3rd party
+import openai
+from textual.widgets import Input
+
+# Internal
+from geris.gitea import GiteaTools
+from geris.status import StatusCounts
+from geris.tui import Geris
+from .fake_gitea import LOGIN, FakeGitea
+from .fake_openai import FakeOpenAI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIST_TOOLS = [
+    ("list_default_user_repos", {}),
+    ("list_users", {}),
+    ("list_orgs", {}),
+    ("list_repos", {"owner": LOGIN}),
+    ("list_labels", {"owner": LOGIN, "repo": "repo0"}),
+    ("list_milestones", {"owner": LOGIN, "repo": "repo0"}),
+    ("list_issues", {"owner": LOGIN, "repo": "repo0", "state": "all"}),
+]
+ANSWER = "| # | Repository | Open issues |\n|---|---|---|\n" + "".join(
+    f"| {n} | {LOGIN}/repo{n * 5} | {n} |\n" for n in range(1, 40)
+)
+# prompt -> the steps the scripted assistant takes to answer it
+SCRIPT = {
+    "Show me my dashboard": [
+        {"tool_calls": [("default_user", {})]},
+        {"tool_calls": [("dashboard", {})]},
+        {"content": ANSWER},
+    ],
+    "Label the open bugs in repo0 and put them on the next milestone": [
+        {
+            "tool_calls": [
+                ("list_labels", {"owner": LOGIN, "repo": "repo0"}),
+                ("list_milestones", {"owner": LOGIN, "repo": "repo0"}),
+                ("list_issues", {"owner": LOGIN, "repo": "repo0"}),
+            ]
+        },
+        {
+            "tool_calls": [
+                (
+                    "label_issues",
+                    {
+                        "owner": LOGIN,
+                        "repo": "repo0",
+                        "changes": [{"index": n, "labels": [1]} for n in range(1, 6)],
+                    },
+                ),
+                (
+                    "edit_issues",
+                    {
+                        "owner": LOGIN,
+                        "repo": "repo0",
+                        "edits": [{"index": n, "milestone": 1} for n in range(1, 6)],
+                    },
+                ),
+            ]
+        },
+        {"content": "Labelled and scheduled 5 issues.\n\n" + ANSWER[:400]},
+    ],
+}
+
+
+def summary(samples) -> dict:
+    return {
+        "min": round(min(samples), 4),
+        "median": round(statistics.median(samples), 4),
+        "mean": round(statistics.mean(samples), 4),
+        "max": round(max(samples), 4),
+    }
+
+
+def check_tools(messages) -> None:
+    """Fail the run on a tool error, so a broken fake can't pass as a fast turn"""
+    errors = []
+    for n in messages:
+        if n.get("role", None) != "tool":
+            continue
+        result = json.loads(n["content"])
+        if isinstance(result, dict) and (result.get("error") or result.get("failed")):
+            errors.append(n["content"][:300])
+    if errors:
+        raise RuntimeError("tool calls failed:\n" + "\n".join(errors))
+
+
+class Bench:
+    """Runs each benchmark against fresh fake servers and collects the results"""
+
+    def __init__(self, args):
+        self.args = args
+        self.results = []
+        self.gitea = FakeGitea(
+            repos=args.repos,
+            issues=args.issues,
+            latency=args.latency,
+            jitter=args.jitter,
+        )
+        self.llm = FakeOpenAI(SCRIPT, think=args.think, token=args.token)
+        # caches go here rather than ~/.cache/geris, so runs start alike and
+        # leave the user's own caches alone
+        self.home = tempfile.mkdtemp(prefix="geris-bench-")
+        self.config = configparser.ConfigParser()
+        self.config["gitea:bench"] = {
+            "uri": self.gitea.start(),
+            "token": "bench",
+            # measure geris, not the politeness limit meant for real servers
+            "rate_limit": "0",
+            "schema_cache": os.path.join(self.home, "schemas.json"),
+            "heatmap_cache": os.path.join(self.home, "heatmap.json"),
+        }
+        self.config["openai:bench"] = {
+            "uri": self.llm.start(),
+            "token": "bench",
+            "model": "bench",
+            "rate_limit": "0",
+        }
+        for pair in args.set or []:
+            key, _, val = pair.partition("=")
+            section, _, key = key.rpartition(".")
+            self.config[f"{section or 'gitea'}:bench"][key] = val
+        openai.api_base = self.config["openai:bench"]["uri"]
+        openai.api_key = "bench"
+
+    def profile(self, **overrides) -> configparser.SectionProxy:
+        name = "gitea:" + "-".join(f"{k}_{v}" for k, v in overrides.items())
+        if name not in self.config:
+            self.config[name] = dict(
+                self.config["gitea:bench"], **{k: str(v) for k, v in overrides.items()}
+            )
+        return self.config[name]
+
+    def tools(self, **overrides) -> GiteaTools:
+        profile = self.profile(**overrides)
+        if profile.get("backend", "sync") == "async":
+            # Internal
+            from geris.aio import AsyncGiteaTools
+
+            return AsyncGiteaTools(profile["uri"], "bench", profile)
+        return GiteaTools(profile["uri"], "bench", profile)
+
+    def measure(self, name, fn, params=None, setup=None, **extra) -> dict:
+        """Time fn over the configured runs, with setup() untimed before each"""
+        samples, requests = [], []
+        for _ in range(self.args.runs):
+            arg = setup() if setup else None
+            self.gitea.reset()
+            mark = time.perf_counter()
+            fn(arg) if setup else fn()
+            samples.append(time.perf_counter() - mark)
+            requests.append(self.gitea.count())
+        result = {
+            "name": name,
+            "params": params or {},
+            "runs": self.args.runs,
+            "seconds": summary(samples),
+            "requests": max(requests),
+            **extra,
+        }
+        self.results.append(result)
+        print(
+            f"{name:<40} {json.dumps(params or {}):<48} "
+            f"{result['seconds']['median']:>8.3f}s {result['requests']:>7} req",
+            flush=True,
+        )
+        return result
+
+    # -- benchmarks --------------------------------------------------------
+
+    def bench_dashboard(self) -> None:
+        for backend in ("sync", "async"):
+            for search in (True, False):
+                params = {"backend": backend, "issue_search": search}
+                self.gitea.search = search
+                self.measure(
+                    "dashboard.cold",
+                    lambda t: t.dashboard(),
+                    params,
+                    setup=lambda: self.tools(**params),
+                )
+                warm = self.tools(**params)
+                warm.dashboard()
+                self.measure("dashboard.warm", warm.dashboard, params)
+        self.gitea.search = True
+
+    def bench_list(self) -> None:
+        for backend in ("sync", "async"):
+            # no result cache: every call reaches the (fake) server
+            tools = self.tools(backend=backend, cache_size=0)
+            for name, args in LIST_TOOLS:
+                self.measure(
+                    f"tool.{name}",
+                    lambda: tools.call(name, dict(args)),
+                    {"backend": backend, **args},
+                )
+
+    def bench_status(self) -> None:
+        for backend in ("sync", "async"):
+            tools = self.tools(backend=backend)
+            self.measure(
+                "status.refresh",
+                lambda s: s.refresh(True),
+                {"backend": backend},
+                setup=lambda: StatusCounts(tools),
+            )
+
+    def bench_chat(self) -> None:
+        for stream in (True, False):
+            for prompt in SCRIPT:
+                self.config["openai:bench"]["stream"] = str(stream).lower()
+                turns = []
+
+                async def turn(app):
+                    async with app.run_test() as pilot:
+                        await app.workers.wait_for_complete()
+                        self.gitea.reset()
+                        mark = time.perf_counter()
+                        app.show_output(Input.Submitted(app._input, prompt))
+                        await pilot.pause()
+                        await app.workers.wait_for_complete()
+                        seconds = time.perf_counter() - mark
+                        turns.append(dict(app._lastTurn.stats))
+                        check_tools(app._messages)
+                        return seconds
+
+                def run(app):
+                    # the whole turn, from submitting the prompt to the workers
+                    # settling, is timed inside the app's own event loop
+                    self._chatSeconds.append(asyncio.run(turn(app)))
+
+                self._chatSeconds = []
+                result = self.measure(
+                    "chat.turn",
+                    run,
+                    {"stream": stream, "prompt": prompt},
+                    setup=self.app,
+                )
+                result["seconds"] = summary(self._chatSeconds)
+                result["stats"] = {
+                    k: round(statistics.median(n[k] for n in turns), 4)
+                    for k in turns[0]
+                }
+
+    def app(self) -> Geris:
+        app = Geris()
+        app.setup_app(
+            self.config["gitea:bench"]["uri"],
+            "bench",
+            "bench",
+            False,
+            self.config["gitea:bench"],
+            self.config["openai:bench"],
+        )
+        return app
+
+    def bench_startup(self) -> None:
+        path = os.path.join(self.home, "gerisrc")
+        with open(path, "w") as fp:
+            self.config.write(fp)
+        phases = []
+
+        def start():
+            # geris itself, in a fresh interpreter so imports are timed cold;
+            # --startup-profile prints a phase table on stdout once it exits
+            out = subprocess.run(
+                [sys.executable, "-c", "import geris; geris.main()"]
+                + ["-c", path, "-g", "bench", "-o", "bench", "--startup-profile"],
+                cwd=ROOT,
+                capture_output=True,
+                check=True,
+                text=True,
+            )
+            lines = out.stdout.strip().splitlines()
+            header = next(k for k, n in enumerate(lines) if n.startswith("phase "))
+            phases.append(
+                {
+                    name.strip(): float(seconds)
+                    for name, seconds in (
+                        n.rsplit(None, 1) for n in lines[header + 1 :]
+                    )
+                }
+            )
+
+        result = self.measure("startup", start)
+        result["phases"] = {
+            k: round(statistics.median(n[k] for n in phases), 4) for k in phases[0]
+        }
+
+    BENCHMARKS = ("startup", "dashboard", "list", "status", "chat")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Benchmark geris against local stand-ins for Gitea and OpenAI.",
+    )
+    parser.add_argument("--repos", type=int, default=100, help="Repos to serve")
+    parser.add_argument("--issues", type=int, default=20, help="Issues per repo")
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="Seconds added to every request"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Up to this many seconds more"
+    )
+    parser.add_argument(
+        "--think", type=float, default=0.05, help="Model delay before answering"
+    )
+    parser.add_argument(
+        "--token", type=float, default=0.002, help="Model delay per streamed chunk"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Runs per benchmark")
+    parser.add_argument(
+        "--only",
+        action="append",
+        choices=Bench.BENCHMARKS,
+        help="Run only these benchmarks (repeatable)",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        metavar="[SECTION.]KEY=VALUE",
+        help="Override a profile key, e.g. workers=16 or openai.max_tools=0",
+    )
+    parser.add_argument(
+        "--out", default="bench_results.json", help="Where to write the JSON results"
+    )
+    args = parser.parse_args()
+
+    bench = Bench(args)
+    started = time.time()
+    try:
+        for name in args.only or Bench.BENCHMARKS:
+            getattr(bench, f"bench_{name}")()
+    finally:
+        bench.gitea.stop()
+        bench.llm.stop()
+        shutil.rmtree(bench.home, ignore_errors=True)
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    report = {
+        "meta": {
+            "commit": commit or None,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+            "seconds": round(time.time() - started, 2),
+            "args": vars(args),
+        },
+        "results": bench.results,
+    }
+    with open(args.out, "w") as fp:
+        json.dump(report, fp, indent=2)
+    print(f"Results written to {args.out}")
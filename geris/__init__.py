@@ -5,12 +5,7 @@ import argparse
 import configparser
 import os
 import sys
-
-# 3rd party
-import openai
-
-# Internal
-from .tui import Geris
+import time
 
 config = configparser.ConfigParser()
 debugFlag = False
@@ -54,7 +49,39 @@ def main():
         help="Specify the openai profile to use.",
         default="default",
     )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Start up to the first prompt, then exit and report time per phase",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        help="Write spans for every turn, LLM call, tool call and request to this "
+        "file: a Chrome trace if it ends in .json, JSON lines otherwise",
+    )
+    session = parser.add_mutually_exclusive_group()
+    session.add_argument(
+        "--record",
+        type=str,
+        metavar="DIR",
+        help="Record every Gitea exchange and model call of the session to DIR",
+    )
+    session.add_argument(
+        "--replay",
+        type=str,
+        metavar="DIR",
+        help="Re-run the prompts recorded in DIR offline, then compare timings",
+    )
+    parser.add_argument(
+        "--replay-timing",
+        action="store_true",
+        help="Wait as long as the recording did for each reply during --replay",
+    )
 
+    # openai, textual, rich and giteapy are only imported once the arguments
+    # are known to need them, so --help and config errors return instantly
+    startup = [("start", time.perf_counter())]
     args = parser.parse_args()
     if not os.path.isfile(args.config):
         print(f"\033[1;31mERROR\033[0m: {args.config} does not exist.")
@@ -63,19 +90,55 @@ def main():
 
     if args.debug:
         debugFlag = True
+    startup.append(("arguments and config", time.perf_counter()))
+
+    # 3rd party
+    import openai
+
+    startup.append(("import openai", time.perf_counter()))
+
+    # Internal
+    from .record import Session
+    from .trace import tracer
+    from .tui import Geris
+
+    startup.append(("import textual, rich, giteapy", time.perf_counter()))
 
     openaiConfig = config[f"openai:{args.openai_profile}"]
     openai.api_base = openaiConfig.get("uri", "UNSET")
     openai.api_key = openaiConfig.get("token", "UNSET")
 
+    session = None
+    if args.record or args.replay:
+        session = Session(
+            args.record or args.replay, bool(args.replay), args.replay_timing
+        )
+
     app = Geris()
     app.setup_app(
         config[f"gitea:{args.gitea_profile}"].get("uri", "UNSET"),
         config[f"gitea:{args.gitea_profile}"].get("token", "UNSET"),
         config[f"openai:{args.openai_profile}"].get("model", "UNSET"),
         args.debug,
+        config[f"gitea:{args.gitea_profile}"],
+        openaiConfig,
+        startup if args.startup_profile else None,
+        session,
     )
+    startup.append(("tools and clients", time.perf_counter()))
+    tracer.export_to(args.trace)
     app.run()
+    tracer.flush()
+    if session is not None:
+        session.close()
+        if session.replaying:
+            print(session.report())
+
+    if args.startup_profile:
+        print(f"{'phase':<32} {'seconds':>8}")
+        for (_, prev), (name, mark) in zip(startup, startup[1:]):
+            print(f"{name:<32} {mark - prev:>8.3f}")
+        print(f"{'first prompt ready':<32} {startup[-1][1] - startup[0][1]:>8.3f}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,281 @@
+# Stdlib
+import asyncio
+import atexit
+import json
+import threading
+from typing import List
+from urllib.parse import urlsplit
+
+# 3rd party
+import aiohttp
+from giteapy.rest import ApiException
+from multidict import CIMultiDict
+
+# Internal
+from .cache import TTLCache
+from .client import Response
+from .gitea import GiteaTools
+from .trace import carry, current, span
+from .utils import opt
+
+
+def _params(query) -> List[tuple]:
+    # aiohttp refuses bools and None in query strings
+    return [
+        (k, str(v).lower() if isinstance(v, bool) else v)
+        for k, v in (query or [])
+        if v is not None
+    ]
+
+
+class AsyncTransport:
+    """One aiohttp session on an event loop of its own
+
+    Coroutines are submitted from any thread with run(); thousands of
+    requests can be in flight on the loop while only the connector's limit
+    of connections is open."""
+
+    def __init__(self, limit=100, timeout=(5.0, 30.0), keep_alive=True, etags=512):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="gitea-aio", daemon=True
+        )
+        self._thread.start()
+        self._etags = TTLCache(etags)
+        self.revalidated = 0
+        self.counters = {"opened": 0, "reused": 0, "waits": 0, "waited": 0.0}
+        self.session = self.run(self._open(limit, timeout, keep_alive))
+        atexit.register(self.close)
+
+    async def _open(self, limit, timeout, keep_alive):
+        trace = aiohttp.TraceConfig()
+        started = {}
+
+        async def opened(*_):
+            self.counters["opened"] += 1
+
+        async def reused(*_):
+            self.counters["reused"] += 1
+
+        async def queued(session, ctx, params):
+            started[id(ctx)] = self.loop.time()
+
+        async def dequeued(session, ctx, params):
+            self.counters["waits"] += 1
+            self.counters["waited"] += self.loop.time() - started.pop(id(ctx), 0.0)
+
+        trace.on_connection_create_end.append(opened)
+        trace.on_connection_reuseconn.append(reused)
+        trace.on_connection_queued_start.append(queued)
+        trace.on_connection_queued_end.append(dequeued)
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=limit, force_close=not keep_alive),
+            timeout=aiohttp.ClientTimeout(connect=timeout[0], sock_read=timeout[1]),
+            trace_configs=[trace],
+        )
+
+    def run(self, coro):
+        """Run coro on the transport's loop, blocking the calling thread for it"""
+        return asyncio.run_coroutine_threadsafe(
+            carry(coro, current()), self.loop
+        ).result()
+
+    def close(self) -> None:
+        if self.loop.is_running():
+            self.run(self.session.close())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def request(self, method, url, query=None, headers=None, body=None):
+        """Send one request, raising giteapy's ApiException for non-2xx replies
+
+        Transport failures become ApiException with status 0, the way
+        giteapy reports them, so the governor classifies both alike."""
+        try:
+            async with self.session.request(
+                method,
+                url,
+                params=_params(query),
+                headers=headers,
+                data=None if body is None else json.dumps(body),
+            ) as resp:
+                retv = Response(
+                    resp.status,
+                    resp.reason,
+                    await resp.text(),
+                    CIMultiDict(resp.headers),
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ApiException(status=0, reason=f"{type(e).__name__}: {e}") from e
+        if not 200 <= retv.status <= 299:
+            raise ApiException(http_resp=retv)
+        return retv
+
+    async def get_json(self, url, query=None, headers=None):
+        """GET url as JSON, revalidating a cached copy with If-None-Match"""
+        key = (url, tuple(_params(query)))
+        cached = self._etags.get(key, None)
+        headers = dict(headers or {})
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        # requests through AsyncRESTClient get their span from the ApiClient
+        try:
+            with span("http", f"GET {urlsplit(url).path}") as s:
+                try:
+                    resp = await self.request("GET", url, query, headers)
+                except ApiException as e:
+                    s.set(status=e.status, bytes=len(e.body or ""))
+                    raise
+                s.set(status=resp.status, bytes=len(resp.data))
+        except ApiException as e:
+            if e.status == 304 and cached is not None:
+                self.revalidated += 1
+                return cached[1], cached[2]
+            raise
+        data = json.loads(resp.data) if resp.data else None
+        if resp.getheader("ETag", None):
+            self._etags.put(key, (resp.getheader("ETag"), data, resp.getheaders()))
+        return data, resp.getheaders()
+
+    def stats(self) -> dict:
+        return dict(self.counters, waited=round(self.counters["waited"], 2))
+
+
+class AsyncRESTClient:
+    """Stand-in for giteapy's urllib3 RESTClientObject that sends over a transport
+
+    giteapy's generated API methods keep working unchanged; each call
+    blocks only its own thread while the request runs on the shared loop."""
+
+    def __init__(self, transport: AsyncTransport):
+        self._transport = transport
+
+    def request(
+        self,
+        method,
+        url,
+        query_params=None,
+        headers=None,
+        body=None,
+        post_params=None,
+        _preload_content=True,
+        _request_timeout=None,
+    ):
+        return self._transport.run(
+            self._transport.request(method, url, query_params, headers, body)
+        )
+
+    def GET(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def HEAD(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def OPTIONS(self, url, **kwargs):
+        return self.request("OPTIONS", url, **kwargs)
+
+    def DELETE(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def POST(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def PUT(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def PATCH(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+
+class AsyncGiteaTools(GiteaTools):
+    """GiteaTools over one aiohttp session instead of a urllib3 pool per thread
+
+    The tools, their names and schemas are inherited unchanged. Listings,
+    the list_* tools' included, and the fan-outs behind the dashboard,
+    status counts and store sync run as coroutines on the session's loop,
+    so hundreds of listings can be in flight without a thread each. Other
+    giteapy calls go through the same session, but block the calling
+    thread while their one request runs on the loop."""
+
+    def __init__(self, host, token, profile=None):
+        super().__init__(host, token, profile)
+        self._host = f"{host}/api/v1"
+        self._auth = {"Authorization": f"token {token}", "Accept": "application/json"}
+        self._aio = AsyncTransport(
+            opt(profile, "pool_size", 100),
+            (opt(profile, "connect_timeout", 5.0), opt(profile, "read_timeout", 30.0)),
+            opt(profile, "keep_alive", True),
+            opt(profile, "etag_cache", 512),
+        )
+        self._client.rest_client = AsyncRESTClient(self._aio)
+        self._governor = self._client._governor
+
+    def pool_stats(self) -> dict:
+        return self._aio.stats()
+
+    def cache_stats(self) -> dict:
+        native = dict(self._aio._etags.stats(), revalidated=self._aio.revalidated)
+        return dict(super().cache_stats(), native=native)
+
+    async def _aget(self, path, path_params=None, **query):
+        url = self._host + path.format(**(path_params or {}))
+        return await self._governor.acall(
+            lambda: self._aio.get_json(url, list(query.items()), self._auth)
+        )
+
+    async def _apages(self, path, path_params=None, limit=None, **query) -> list:
+        """Every item of a listing; once the total is known the rest load at once"""
+        size = min(self._pageSize, limit) if limit else self._pageSize
+        data, headers = await self._aget(path, path_params, page=1, limit=size, **query)
+        # cached pages are shared with later calls, so collect into a new list
+        items = list(data)
+        total = headers.get("X-Total-Count", None)
+        if data and len(data) < size and (total is None or int(total) > len(data)):
+            # the server caps the page size, see paginate
+            size = len(data)
+        if total is not None:
+            wanted = min(int(total), limit) if limit else int(total)
+            rest = await asyncio.gather(
+                *[
+                    self._aget(path, path_params, page=n, limit=size, **query)
+                    for n in range(2, -(-wanted // size) + 1)
+                ]
+            )
+            for data, _ in rest:
+                items += data
+        else:
+            # no total to plan with: walk pages until a short one
+            page = 1
+            while len(data) == size and (not limit or len(items) < limit):
+                page += 1
+                data, _ = await self._aget(
+                    path, path_params, page=page, limit=size, **query
+                )
+                items += data
+        return items[:limit] if limit else items
+
+    def _pages(self, path, path_params=None, limit=None, **query):
+        return iter(self._aio.run(self._apages(path, path_params, limit, **query)))
+
+    async def _acount(self, path, path_params=None, **query) -> int:
+        data, headers = await self._aget(path, path_params, limit=1, **query)
+        if headers.get("X-Total-Count", None) is not None:
+            return int(headers["X-Total-Count"])
+        return len(await self._apages(path, path_params, **query))
+
+    def _gather(self, fn, specs) -> List[tuple]:
+        async def one(spec):
+            try:
+                return await fn(spec[0], spec[1], **spec[2]), None
+            except Exception as e:
+                return None, e
+
+        async def every():
+            return await asyncio.gather(*[one(n) for n in specs])
+
+        return self._aio.run(every())
+
+    def _listings(self, specs) -> List[tuple]:
+        return self._gather(self._apages, specs)
+
+    def _counts(self, specs) -> List[tuple]:
+        return self._gather(self._acount, specs)
@@ -0,0 +1,55 @@
+# Stdlib
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire after a per-entry TTL"""
+
+    def __init__(self, size=256):
+        self._size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key, None)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, ttl=None) -> None:
+        if self._size <= 0:
+            return
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, match) -> int:
+        """Drop every entry whose key satisfies match(key)"""
+        with self._lock:
+            stale = [k for k in self._data if match(k)]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
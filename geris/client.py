@@ -0,0 +1,225 @@
+# Stdlib
+import contextlib
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+# 3rd party
+import giteapy
+import urllib3
+from giteapy.rest import ApiException
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Internal
+from .cache import TTLCache
+from .governor import Governor, retry_after
+from .trace import span
+
+# methods that can be repeated without changing the outcome
+IDEMPOTENT = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+# statuses that say nothing about the request itself, only the server
+TRANSIENT = (429, 500, 502, 503, 504)
+
+
+def transient(err):
+    """Governor classifier: retry delay for timeouts, 429 and 5xx, else None"""
+    if isinstance(err, ApiException):
+        # giteapy reports SSL and other transport failures as status 0
+        if err.status == 0 or err.status in TRANSIENT:
+            return retry_after(err.headers)
+        return None
+    if isinstance(err, urllib3.exceptions.HTTPError):
+        return 0.0
+    return None
+
+
+def _rejected(err) -> bool:
+    return isinstance(err, ApiException) and err.status == 429
+
+
+class Response:
+    """The parts of giteapy's RESTResponse that ApiClient and the ETag cache use"""
+
+    def __init__(self, status, reason, data, headers):
+        self.status = status
+        self.reason = reason
+        self.data = data
+        self._headers = headers
+
+    def getheaders(self):
+        return self._headers
+
+    def getheader(self, name, default=None):
+        return self._headers.get(name, default)
+
+
+def _counted(base):
+    """urllib3 pool class that also counts waits for, and discards of, connections"""
+
+    class Pool(base):
+        waits = 0
+        waited = 0.0
+        discarded = 0
+
+        def _get_conn(self, timeout=None):
+            if self.pool is None or not self.pool.empty():
+                return super()._get_conn(timeout)
+            mark = time.monotonic()
+            try:
+                return super()._get_conn(timeout)
+            finally:
+                self.waits += 1
+                self.waited += time.monotonic() - mark
+
+        def _put_conn(self, conn):
+            if conn is not None and self.pool is not None and self.pool.full():
+                self.discarded += 1
+            return super()._put_conn(conn)
+
+    return Pool
+
+
+class CachingApiClient(giteapy.ApiClient):
+    """giteapy ApiClient that revalidates repeated GETs with If-None-Match
+
+    Responses carrying an ETag are kept per URL along with their decoded
+    body, so a 304 skips both the download and giteapy's deserialization.
+    Bodies served from here are shared between callers; treat them as
+    read-only.
+
+    Every request goes through the governor, which rate limits it and
+    retries transient failures of idempotent methods.
+
+    Connections are kept per host in a pool of configuration's
+    connection_pool_maxsize; with block set, callers beyond that wait for a
+    free connection instead of opening one that is thrown away after.
+    With concurrency set, at most that many requests are in flight at
+    once, whichever thread or pool they come from."""
+
+    def __init__(
+        self,
+        configuration,
+        size=512,
+        governor=None,
+        timeout=None,
+        block=False,
+        keep_alive=True,
+        concurrency=None,
+    ):
+        super().__init__(configuration)
+        self._etags = TTLCache(size)
+        self._governor = governor or Governor(configuration.host)
+        self._timeout = timeout
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self.revalidated = 0
+
+        # pools are created lazily, so this applies to every host's pool
+        manager = self.rest_client.pool_manager
+        manager.pool_classes_by_scheme = {
+            "http": _counted(HTTPConnectionPool),
+            "https": _counted(HTTPSConnectionPool),
+        }
+        manager.connection_pool_kw["block"] = block
+        if keep_alive:
+            # notice connections silently dropped by NATs and proxies while idle
+            manager.connection_pool_kw["socket_options"] = (
+                HTTPConnection.default_socket_options
+                + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            )
+        else:
+            self.default_headers["Connection"] = "close"
+
+    def _attempt(self, method, url, *args, **kwargs):
+        slot = self._slots or contextlib.nullcontext()
+        with slot, span("http", f"{method} {urlsplit(url).path}") as s:
+            try:
+                resp = super().request(method, url, *args, **kwargs)
+            except ApiException as e:
+                s.set(status=e.status, bytes=len(e.body or ""))
+                raise
+            s.set(status=resp.status, bytes=len(resp.data or ""))
+            return resp
+
+    def _send(self, method, *args, **kwargs):
+        return self._governor.call(
+            lambda: self._attempt(method, *args, **kwargs),
+            retry=True if method in IDEMPOTENT else _rejected,
+        )
+
+    def request(
+        self,
+        method,
+        url,
+        query_params=None,
+        headers=None,
+        post_params=None,
+        body=None,
+        _preload_content=True,
+        _request_timeout=None,
+    ):
+        _request_timeout = _request_timeout or self._timeout
+        if method != "GET" or not _preload_content:
+            return self._send(
+                method,
+                url,
+                query_params,
+                headers,
+                post_params,
+                body,
+                _preload_content,
+                _request_timeout,
+            )
+
+        key = (url, tuple(query_params or ()))
+        cached = self._etags.get(key, None)
+        headers = dict(headers or {})
+        if cached is not None:
+            headers["If-None-Match"] = cached.getheader("ETag")
+        try:
+            resp = self._send(
+                method,
+                url,
+                query_params,
+                headers,
+                _preload_content=_preload_content,
+                _request_timeout=_request_timeout,
+            )
+        except ApiException as e:
+            if e.status == 304 and cached is not None:
+                self.revalidated += 1
+                return cached
+            raise
+
+        if resp.getheader("ETag", None):
+            self._etags.put(key, resp)
+        return resp
+
+    def deserialize(self, response, response_type):
+        decoded = getattr(response, "_decoded", None)
+        if decoded is not None and decoded[0] == response_type:
+            return decoded[1]
+        retv = super().deserialize(response, response_type)
+        response._decoded = (response_type, retv)
+        return retv
+
+    def stats(self) -> dict:
+        return dict(self._etags.stats(), revalidated=self.revalidated)
+
+    def governor_stats(self) -> dict:
+        return self._governor.stats()
+
+    def pool_stats(self) -> dict:
+        """Connections opened, requests that reused one, and waits for a free one"""
+        retv = {"opened": 0, "reused": 0, "waits": 0, "waited": 0.0, "discarded": 0}
+        pools = self.rest_client.pool_manager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            retv["opened"] += pool.num_connections
+            retv["reused"] += max(pool.num_requests - pool.num_connections, 0)
+            retv["waits"] += getattr(pool, "waits", 0)
+            retv["waited"] += getattr(pool, "waited", 0.0)
+            retv["discarded"] += getattr(pool, "discarded", 0)
+        retv["waited"] = round(retv["waited"], 2)
+        return retv
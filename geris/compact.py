@@ -0,0 +1,159 @@
+ISSUE = (
+    "number",
+    "title",
+    "state",
+    "body",
+    "user",
+    "assignees",
+    "labels",
+    "milestone",
+    "comments",
+    "due_date",
+    "created_at",
+    "updated_at",
+    "closed_at",
+    "pull_request",
+    "html_url",
+)
+PR = (
+    "number",
+    "title",
+    "state",
+    "user",
+    "assignees",
+    "labels",
+    "milestone",
+    "head",
+    "base",
+    "mergeable",
+    "merged",
+    "updated_at",
+    "html_url",
+)
+REPO = (
+    "full_name",
+    "description",
+    "private",
+    "fork",
+    "archived",
+    "open_issues_count",
+    "updated_at",
+    "html_url",
+)
+LABEL = ("id", "name", "color", "description")
+MILESTONE = (
+    "id",
+    "title",
+    "description",
+    "state",
+    "open_issues",
+    "closed_issues",
+    "due_on",
+)
+USER = ("id", "login", "full_name", "email", "is_admin")
+ORG = ("id", "username", "full_name", "description")
+
+
+def _batch(spec):
+    """Spec for a batch tool whose per-item results are projected with spec"""
+    return {
+        "succeeded": None,
+        "failed": None,
+        "results": {"ok": None, "error": None, "result": spec},
+    }
+
+
+# tool -> fields kept for the model: a tuple applies to the result (or each
+# item of a list result), a dict projects the named keys of a dict result.
+# Tools that aren't listed are passed through with only the size caps applied.
+FIELDS = {
+    "dashboard": {
+        "login": None,
+        "full_name": None,
+        "repositories": REPO,
+        "issues": ISSUE,
+        "milestones": MILESTONE,
+        "prs": PR,
+        "errors": None,
+    },
+    "list_default_user_repos": REPO,
+    "list_repos": REPO,
+    "list_users": USER,
+    "list_orgs": ORG,
+    "list_labels": LABEL,
+    "get_label": LABEL,
+    "get_labels": LABEL,
+    "add_labels": LABEL,
+    "label_issues": _batch(LABEL),
+    "create_label": LABEL,
+    "create_labels": _batch(LABEL),
+    "list_milestones": MILESTONE,
+    "get_milestone": MILESTONE,
+    "create_milestone": MILESTONE,
+    "list_issues": ISSUE,
+    "get_issue": ISSUE,
+    "edit_issue": ISSUE,
+    "edit_issues": _batch(ISSUE),
+    "close_issue": ISSUE,
+    "close_issues": _batch(ISSUE),
+    "create_issue": ISSUE,
+    "create_issues": _batch(ISSUE),
+}
+
+
+def _trim(key, value):
+    """Reduce nested objects to the ids and names the model refers back to"""
+    if isinstance(value, list):
+        return [_trim(key, n) for n in value]
+    if not isinstance(value, dict):
+        return value
+    if key in ("user", "assignee", "assignees", "owner", "poster", "closed_by"):
+        return value.get("login", None)
+    if key in ("repository", "repo"):
+        return value.get("full_name", None)
+    if key in ("head", "base"):
+        return value.get("label", None) or value.get("ref", None)
+    if key == "pull_request":
+        return {k: value[k] for k in ("merged", "merged_at") if k in value} or True
+    return {
+        k: value[k]
+        for k in ("id", "name", "login", "title", "full_name")
+        if value.get(k, None) is not None
+    }
+
+
+def _project(value, spec):
+    if spec is None:
+        return value
+    if isinstance(value, list):
+        return [_project(n, spec) for n in value]
+    if not isinstance(value, dict):
+        return value
+    if isinstance(spec, dict):
+        return {k: _project(value[k], v) for k, v in spec.items() if k in value}
+    return {k: _trim(k, value[k]) for k in spec if value.get(k, None) is not None}
+
+
+def _cap(value, max_items, max_text):
+    if isinstance(value, str) and len(value) > max_text:
+        return value[:max_text] + f"... [{len(value) - max_text} more characters]"
+    if isinstance(value, dict):
+        return {k: _cap(v, max_items, max_text) for k, v in value.items()}
+    if isinstance(value, list):
+        items = [_cap(n, max_items, max_text) for n in value[:max_items]]
+        if len(value) > max_items:
+            return {
+                "total": len(value),
+                "shown": max_items,
+                "note": "Truncated; narrow the request with filters or a limit",
+                "items": items,
+            }
+        return items
+    return value
+
+
+def compact(name, result, max_items=50, max_text=2000):
+    """Project a tool result down to what the model needs before it is sent"""
+    if isinstance(result, dict) and "error" in result:
+        return _cap(result, max_items, max_text)
+    return _cap(_project(result, FIELDS.get(name, None)), max_items, max_text)
@@ -0,0 +1,95 @@
+# Stdlib
+import json
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List
+
+# Internal
+from .gitea import GiteaTools
+from .trace import submit
+
+
+class ToolDispatcher:
+    """Run the tool calls of one assistant turn concurrently
+
+    Calls on different repos, and reads on the same repo, have no data
+    dependency and run in parallel. A mutation waits for every earlier call
+    on its repo, and later calls on that repo wait for the mutation, so the
+    model sees writes applied in the order it asked for them."""
+
+    def __init__(self, tools: GiteaTools, workers=4):
+        self._tools = tools
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+
+    def _lane(self, call):
+        try:
+            args = json.loads(call["function"]["arguments"] or "{}")
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(args, dict) or not args.get("owner") or not args.get("repo"):
+            return None
+        return f"{args['owner']}/{args['repo']}".lower()
+
+    def batch(self, fn: Callable) -> "ToolBatch":
+        """Start a turn whose calls are submitted one by one as they become known"""
+        return ToolBatch(self, fn)
+
+    def run(self, calls: List[dict], fn: Callable) -> list:
+        """Return fn(call) for every call, in the original call order"""
+        batch = self.batch(fn)
+        for call in calls:
+            batch.submit(call)
+        return batch.results()
+
+    @staticmethod
+    def _after(deps, fn, call):
+        # dependencies were submitted first, so they are already running or done
+        for dep in deps:
+            if dep is not None:
+                dep.exception()
+        return fn(call)
+
+
+class ToolBatch:
+    """The tool calls of one assistant turn, started as soon as each is submitted"""
+
+    def __init__(self, dispatcher: ToolDispatcher, fn: Callable):
+        self._dispatcher = dispatcher
+        self._fn = fn
+        self._lanes = {}
+        self._futures = []
+
+    def submit(self, call: dict) -> None:
+        d = self._dispatcher
+        key = d._lane(call)
+        write, reads = self._lanes.get(key, (None, []))
+        if key is not None and d._tools.mutates(call["function"]["name"]):
+            fut = submit(d._pool, d._after, [write] + reads, self._fn, call)
+            self._lanes[key] = (fut, [])
+        else:
+            fut = submit(d._pool, d._after, [write], self._fn, call)
+            if key is not None:
+                self._lanes[key] = (write, reads + [fut])
+        self._futures.append(fut)
+
+    def answer(self, call: dict, result) -> None:
+        """Take result as call's outcome without running it, in its place in the order"""
+        fut = Future()
+        fut.set_result(result)
+        self._futures.append(fut)
+
+    def results(self, cancelled: Callable = None) -> list:
+        """fn(call) for every submitted call, in submission order
+
+        cancelled is polled while waiting; once it returns True the calls
+        not started yet are cancelled and None is returned instead."""
+        pending = set(self._futures) if cancelled is not None else ()
+        while pending:
+            if cancelled():
+                self.cancel()
+                return None
+            _, pending = wait(pending, timeout=0.1)
+        return [fut.result() for fut in self._futures]
+
+    def cancel(self) -> int:
+        """Cancel the calls that haven't started, returning how many there were"""
+        return sum(1 for fut in self._futures if fut.cancel())
@@ -1,107 +1,448 @@
 # Stdlib
 import sys
+import functools
+import inspect
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 # 3rd party
 import giteapy
+from giteapy.rest import ApiException
 
 # internal
-from .utils import tool, func2tool
+from .cache import MISSING, TTLCache
+from .client import CachingApiClient, transient
+from .governor import governor
+from .store import IssueStore
+from .utils import tool, doc_tags, func2tool, fanout, opt, paginate, validator
+from .utils import load_schemas, save_schemas, source_hash
+from .utils import ToolArgumentError
+
+
+def _reason(err) -> str:
+    """Short description of a failure, without giteapy's dump of the response headers"""
+    if isinstance(err, ApiException):
+        return f"{err.status} {err.reason}: {err.body}".strip()
+    return str(err)
+
+
+def _is_tool(v) -> bool:
+    return getattr(v, "_is_tool", False)
 
 
 class GiteaTools:
     """ """
 
-    def __init__(self, host, token):
+    # per-repo open listings behind the dashboard and status bar, in the
+    # order results are merged: name -> (path, extra filters)
+    _repoListings = {
+        "issues": ("/repos/{owner}/{repo}/issues", {"type": "issues"}),
+        "milestones": ("/repos/{owner}/{repo}/milestones", {}),
+        "prs": ("/repos/{owner}/{repo}/pulls", {}),
+    }
+    # listings the cross-repo issue search can also serve: name -> its type filter
+    _searchKinds = {"issues": "issues", "prs": "pulls"}
+
+    def __init__(self, host, token, profile=None):
         _config = giteapy.Configuration()
         _config.host = f"{host}/api/v1"
         _config.api_key["access_token"] = token
-        _client = giteapy.ApiClient(_config)
+        # fan-outs and page fetches share `workers` requests in flight
+        workers = opt(profile, "workers", 8)
+        _config.connection_pool_maxsize = opt(profile, "pool_size", workers)
+        _client = CachingApiClient(
+            _config,
+            opt(profile, "etag_cache", 512),
+            governor(host, profile, transient, rate_limit=50.0, rate_burst=50),
+            timeout=(
+                opt(profile, "connect_timeout", 5.0),
+                opt(profile, "read_timeout", 30.0),
+            ),
+            block=opt(profile, "pool_block", True),
+            keep_alive=opt(profile, "keep_alive", True),
+            concurrency=workers,
+        )
 
         self._tools = []
         self._funcMap = []
+        self._dispatch = {}
+        self._mutating = set()
+        self._tags = {}
+        self._client = _client
         self._issue = giteapy.IssueApi(_client)
         self._admin = giteapy.AdminApi(_client)
         self._user = giteapy.UserApi(_client)
         self._repo = giteapy.RepositoryApi(_client)
 
+        # bounded worker pool shared by every fan-out against this profile
+        self._workers = workers
+        self._pool = ThreadPoolExecutor(
+            max_workers=self._workers, thread_name_prefix="gitea"
+        )
+        # page fetches get their own pool so they never queue behind the
+        # fan-out tasks that are waiting on them; the client's concurrency
+        # limit still counts both
+        self._pageSize = opt(profile, "page_size", 50)
+        self._prefetch = ThreadPoolExecutor(
+            max_workers=self._workers, thread_name_prefix="gitea-page"
+        )
+
+        # optional local mirror backing the search/filter/aggregate tools
+        store = opt(profile, "store", None)
+        self._store = IssueStore(store) if store else None
+        self._syncLock = threading.Lock()
+
+        # memoized read-only tool results, see _wrap
+        self._profile = profile
+        self._cache = TTLCache(opt(profile, "cache_size", 256))
+
+        # cleared for good the first time the server turns out not to have it
+        self._issueSearch = opt(profile, "issue_search", True)
+
         self._tool_scan()
 
     def _tool_scan(self):
-        for k in dir(self):
-            if getattr(getattr(self, k), "_is_tool", False):
-                self._tools.append(getattr(self, k))
+        # tools are found on the class, so each bound method is fetched once
+        names = sorted(
+            {k for c in type(self).__mro__ for k, v in vars(c).items() if _is_tool(v)}
+        )
+        # the tool docstrings live in every geris class a backend derives from
+        key = source_hash(
+            *[
+                c
+                for c in type(self).__mro__
+                if c.__module__.startswith(f"{__package__}.")
+            ],
+            func2tool,
+        )
+        path = os.path.expanduser(
+            opt(self._profile, "schema_cache", "~/.cache/geris/schemas.json")
+        )
+        cached = load_schemas(path, key) if path else {}
+        fresh = {}
+
+        for name in names:
+            n = getattr(self, name)
+            if n._requires is not None and getattr(self, n._requires) is None:
+                continue
+            if name not in cached:
+                cached[name] = fresh[name] = {
+                    "schema": func2tool(n),
+                    "tags": sorted(doc_tags(n)),
+                }
+            schema = cached[name]["schema"]
+            fn = self._wrap(n)
+            setattr(self, name, fn)
+            self._tools.append(n)
+            self._funcMap.append(schema)
+            self._dispatch[name] = (fn, validator(schema))
+            self._tags[name] = set(cached[name]["tags"])
+            if n._mutates:
+                self._mutating.add(name)
+
+        if path and fresh:
+            save_schemas(path, key, cached)
+
+    def _wrap(self, fn):
+        """Memoize tools declared with a ttl; mutating tools drop their repo's entries"""
+        name, sig = fn.__name__, inspect.signature(fn)
+        ttl = None if fn._ttl is None else opt(self._profile, f"ttl_{name}", fn._ttl)
+        if not ttl and not fn._mutates:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            scope = tuple(
+                str(bound.arguments.get(k, None)).lower() for k in ("owner", "repo")
+            )
+            if fn._mutates:
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self._cache.invalidate(lambda key: key[1] == scope)
+
+            key = (
+                name,
+                scope,
+                json.dumps(bound.arguments, sort_keys=True, default=str),
+            )
+            retv = self._cache.get(key)
+            if retv is MISSING:
+                retv = fn(*args, **kwargs)
+                self._cache.put(key, retv, ttl)
+            return retv
+
+        return wrapper
 
-        for n in self._tools:
-            self._funcMap.append(func2tool(n))
+    def cache_stats(self) -> dict:
+        return {"tools": self._cache.stats(), "etags": self._client.stats()}
+
+    def governor_stats(self) -> dict:
+        return self._client.governor_stats()
+
+    def pool_stats(self) -> dict:
+        return self._client.pool_stats()
+
+    def prewarm(self, count=None) -> int:
+        """Open up to count pooled connections ahead of the first real request
+
+        Pays the TCP and TLS handshakes at startup instead of during the
+        first fan-out; returns how many warm-up requests succeeded."""
+        count = self._workers if count is None else count
+        results = fanout(lambda _: self._get("/version"), range(count), self._pool)
+        return sum(1 for _, err in results if err is None)
 
     def tools(self) -> List[dict]:
         return self._funcMap
 
-    @tool
+    def tags(self) -> dict:
+        """Tool name -> category tags, as declared on each tool's tags: line"""
+        return self._tags
+
+    def mutates(self, name) -> bool:
+        return name in self._mutating
+
+    def enabled(self, name) -> bool:
+        return name in self._dispatch
+
+    def call(self, name, args: dict):
+        """Validate args against the tool's schema, then invoke it"""
+        if name not in self._dispatch:
+            raise ToolArgumentError(f"unknown tool '{name}'")
+        fn, validate = self._dispatch[name]
+        validate(args)
+        return fn(**args)
+
+    def _batch(self, name, owner, repo, items) -> dict:
+        """Call tool name once per item of arguments, concurrently on the pool
+
+        Every item is checked against the tool's own schema first; one bad
+        or failing item is reported alongside the others instead of
+        aborting the batch."""
+        fn, validate = self._dispatch[name]
+
+        def one(args):
+            if not isinstance(args, dict):
+                raise ToolArgumentError("each item must be a JSON object")
+            args = dict(args, owner=owner, repo=repo)
+            validate(args)
+            return fn(**args)
+
+        results = []
+        for retv, err in fanout(one, items, self._pool):
+            if err is None:
+                results.append({"ok": True, "result": retv})
+            else:
+                results.append({"ok": False, "error": _reason(err)})
+        failed = sum(1 for n in results if not n["ok"])
+        return {
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "results": results,
+        }
+
+    def _get(self, path, path_params=None, **query):
+        """GET an API path, returning the decoded JSON body and response headers"""
+        data, _, headers = self._client.call_api(
+            path,
+            "GET",
+            path_params=path_params,
+            query_params=[(k, v) for k, v in query.items() if v is not None],
+            header_params={"Accept": "application/json"},
+            response_type="object",
+            auth_settings=["AccessToken"],
+        )
+        return data, headers
+
+    def _pages(self, path, path_params=None, limit=None, **query):
+        """Stream every item of a paginated listing, or the first limit items"""
+
+        def fetch(page, size):
+            data, headers = self._get(path, path_params, page=page, limit=size, **query)
+            total = headers.get("X-Total-Count", None)
+            return data, None if total is None else int(total)
+
+        return paginate(fetch, self._pageSize, limit, self._prefetch)
+
+    def _count(self, path, path_params=None, **query) -> int:
+        # Gitea reports the full size of a listing in X-Total-Count, so a
+        # single-item page is enough; older servers fall back to a full page
+        data, headers = self._get(path, path_params, limit=1, **query)
+        if headers.get("X-Total-Count", None) is not None:
+            return int(headers["X-Total-Count"])
+        return len(self._get(path, path_params, **query)[0])
+
+    def _listings(self, specs) -> List[tuple]:
+        """Every item of each (path, path_params, query) listing, concurrently
+
+        Returns (items, error) pairs in spec order. This and _counts are the
+        fan-out points a backend can replace wholesale."""
+        return fanout(
+            lambda n: list(self._pages(n[0], n[1], **n[2])), specs, self._pool
+        )
+
+    def _counts(self, specs) -> List[tuple]:
+        """Size of each (path, path_params, query) listing, as (count, error) pairs"""
+        return fanout(lambda n: self._count(n[0], n[1], **n[2]), specs, self._pool)
+
+    def _repo_specs(self, tasks, **query) -> List[tuple]:
+        """The listing spec of each (repo, _repoListings kind) task"""
+        retv = []
+        for r, kind in tasks:
+            path, extra = self._repoListings[kind]
+            params = {"owner": r.get("owner", {}).get("login", None), "repo": r["name"]}
+            retv.append((path, params, dict(extra, **query)))
+        return retv
+
+    def _search_open(self, repos, kinds=None) -> dict:
+        """Open issues and PRs of repos from the cross-repo issue search
+
+        Searches once per owner and kind, keeping only results from repos,
+        as {(lowercase full_name, kind): items}. A page-size probe first
+        checks each search costs fewer requests than listing that owner's
+        repos one by one; pairs it skips, or whose search failed, are left
+        out for the caller to list per repo. Servers without the endpoint
+        (404) are remembered and never searched again. kinds limits the
+        search to some of _searchKinds."""
+        if not self._issueSearch or not repos:
+            return {}
+        owned = {}
+        for r in repos:
+            owned.setdefault(r["owner"]["login"], []).append(r["full_name"].lower())
+        kinds = self._searchKinds if kinds is None else kinds
+        tasks = [(o, kind) for o in owned for kind in kinds]
+        specs = [
+            (
+                "/repos/issues/search",
+                None,
+                {"owner": o, "type": self._searchKinds[kind], "state": "open"},
+            )
+            for o, kind in tasks
+        ]
+
+        totals = self._counts(specs)
+        if any(getattr(err, "status", None) in (404, 405) for _, err in totals):
+            self._issueSearch = False
+            return {}
+        wanted = [
+            i
+            for i, (n, err) in enumerate(totals)
+            if err is None and -(-n // self._pageSize) <= len(owned[tasks[i][0]])
+        ]
+
+        retv = {}
+        results = self._listings([specs[i] for i in wanted])
+        for i, (items, err) in zip(wanted, results):
+            if err is not None:
+                continue
+            owner, kind = tasks[i]
+            found = {name: [] for name in owned[owner]}
+            for n in items:
+                name = (
+                    (n.get("repository", None) or {}).get("full_name", None) or ""
+                ).lower()
+                if name in found:
+                    found[name].append(n)
+            retv.update({(name, kind): v for name, v in found.items()})
+        return retv
+
+    def repo_counts(self, repos: List[dict]) -> List[tuple]:
+        """Open issue, milestone and PR counts per repo, as (counts, error) pairs"""
+        found = self._search_open(repos)
+        tasks = [
+            (r, kind)
+            for r in repos
+            for kind in self._repoListings
+            if (r["full_name"].lower(), kind) not in found
+        ]
+        counted = dict(
+            zip(
+                [(r["full_name"].lower(), kind) for r, kind in tasks],
+                self._counts(self._repo_specs(tasks, state="open")),
+            )
+        )
+        retv = []
+        for r in repos:
+            counts, error = {}, None
+            for kind in self._repoListings:
+                key = (r["full_name"].lower(), kind)
+                if key in found:
+                    n, err = len(found[key]), None
+                else:
+                    n, err = counted[key]
+                counts[kind] = n
+                error = error or err
+            retv.append((counts, error))
+        return retv
+
+    @tool(ttl=3600)
     def default_user(self) -> dict:
-        """description:Return the current user, their associated repositories and open tickets"""
+        """description:Return the current user, their associated repositories and open tickets
+        tags:user"""
         return self._user.user_get_current().to_dict().get("login", None)
 
     @tool
     def dashboard(self) -> dict:
-        """description:Return a dashboard with the current user, their repositories and open issues, mildestones and pull requests"""
+        """description:Return a dashboard with the current user, their repositories and open issues, mildestones and pull requests
+        tags:dashboard,user,repo,issue,milestone,pr"""
         retv = self._user.user_get_current().to_dict()
         retv.update(
             {
-                "repositories": [
-                    n.to_dict() for n in self._user.user_current_list_subscriptions()
-                ],
+                "repositories": list(self._pages("/user/subscriptions")),
                 "prs": [],
                 "issues": [],
                 "milestones": [],
+                "errors": [],
             }
         )
-        for r in retv.get("repositories", []):
-            try:
-                [
-                    retv["issues"].append(n.to_dict())
-                    for n in self._issue.issue_list_issues(
-                        owner=r.get("owner", {}).get("login", None),
-                        repo=r.get("name", None),
-                        state="open",
-                    )
-                ]
-                [
-                    retv["milestones"].append(n.to_dict())
-                    for n in self._issue.issue_get_milestones_list(
-                        owner=r.get("owner", {}).get("login", None),
-                        repo=r.get("name", None),
-                        state="open",
-                    )
-                ]
-                [
-                    retv["prs"].append(n.to_dict())
-                    for n in self._repo.repo_list_pull_requests(
-                        owner=r.get("owner", {}).get("login", None),
-                        repo=r.get("name", None),
-                        state="open",
-                    )
-                ]
-            except Exception as e:
-                with open("default_user.debug", "w+") as fp:
-                    fp.write(str(e) + "\n")
-                    fp.write("-" * 80 + "\n")
-                    fp.write(str(r) + "\n")
+
+        # issues come from a few cross-repo searches where the server
+        # supports them; the rest is one task per (repo, listing) so the
+        # slowest repo doesn't serialize the others. PRs are always listed
+        # per repo: the search returns them as issues, without head, base
+        # or merged
+        found = self._search_open(retv["repositories"], ("issues",))
+        for (_, kind), items in found.items():
+            retv[kind].extend(items)
+        tasks = [
+            (r, kind)
+            for r in retv["repositories"]
+            for kind in self._repoListings
+            if (r["full_name"].lower(), kind) not in found
+        ]
+        specs = self._repo_specs(tasks, state="open")
+        for (r, kind), (res, err) in zip(tasks, self._listings(specs)):
+            if err is not None:
+                retv["errors"].append(
+                    {
+                        "repo": r.get("full_name", None),
+                        "call": kind,
+                        "error": _reason(err),
+                    }
+                )
+            else:
+                retv[kind].extend(res)
         return retv
 
     def get_heatmap_data(self, owner: str) -> List[dict]:
         return [n.to_dict() for n in self._user.user_get_heatmap_data(username=owner)]
 
-    @tool
-    def list_default_user_repos(self) -> List[dict]:
-        """description:Return a list of all repos owned by or associated with the default user"""
-        return [n.to_dict() for n in self._user.user_current_list_subscriptions()]
+    @tool(ttl=300)
+    def list_default_user_repos(self, limit: int = None) -> List[dict]:
+        """description:Return a list of all repos owned by or associated with the default user
+        tags:repo,user
+        limit:Maximum number of repos to return, all of them when unset"""
+        return list(self._pages("/user/subscriptions", limit=limit))
 
     @tool
     def list_default_user_issues(self) -> List[dict]:
-        """description:Return a list of all issues assigned to the default user"""
+        """description:Return a list of all issues assigned to the default user
+        tags:issue,user"""
         with open("debug.out", "w+") as fp:
             fp.write("DEBUG")
             fp.write(json.dumps(self.default_user(), indent=2) + "\n")
@@ -111,45 +452,60 @@ class GiteaTools:
         return []
 
     @tool
-    def list_users(self) -> List[str]:
-        """description:Return a list of all users"""
-        return [itm.to_dict() for itm in self._admin.admin_get_all_users()]
+    def list_users(self, limit: int = None) -> List[str]:
+        """description:Return a list of all users
+        tags:user,admin
+        limit:Maximum number of users to return, all of them when unset"""
+        return list(self._pages("/admin/users", limit=limit))
 
     @tool
-    def list_orgs(self) -> List[str]:
-        """description:Return a list of all orgs"""
-        return [itm.to_dict() for itm in self._admin.admin_get_all_orgs()]
-
-    @tool
-    def list_repos(self, owner: str) -> List[dict]:
+    def list_orgs(self, limit: int = None) -> List[str]:
+        """description:Return a list of all orgs
+        tags:org,admin
+        limit:Maximum number of orgs to return, all of them when unset"""
+        return list(self._pages("/admin/orgs", limit=limit))
+
+    @tool(ttl=300)
+    def list_repos(self, owner: str, limit: int = None) -> List[dict]:
         """description:List repos for an owner
+        tags:repo,org,user
         owner:Owner of the repositories to list
+        limit:Maximum number of repos to return, all of them when unset
         required:owner"""
-        return [itm.to_dict() for itm in self._user.user_list_repos(owner)]
+        return list(
+            self._pages("/users/{username}/repos", {"username": owner}, limit=limit)
+        )
 
-    @tool
-    def list_labels(self, owner: str, repo: str) -> List[str]:
+    @tool(ttl=300)
+    def list_labels(self, owner: str, repo: str, limit: int = None) -> List[str]:
         """description:list issue labels for a repository
+        tags:label
         owner:Owner of the repository
         repo:Name of the repository
+        limit:Maximum number of labels to return, all of them when unset
         required:owner,repo"""
-        return [
-            itm.to_dict()
-            for itm in self._issue.issue_list_labels(owner=owner, repo=repo)
-        ]
+        return list(
+            self._pages(
+                "/repos/{owner}/{repo}/labels",
+                {"owner": owner, "repo": repo},
+                limit=limit,
+            )
+        )
 
-    @tool
+    @tool(ttl=300)
     def get_label(self, owner: str, repo: str, id: int) -> dict:
         """description:Get a single label from a repository
+        tags:label
         owner:Owner of the repository
         repo:Name of the repository
         id:ID of the label to get
         required:owner,repo,id"""
         return self._issue.issue_get_label(owner=owner, repo=repo, id=id).to_dict()
 
-    @tool
+    @tool(ttl=300)
     def get_labels(self, owner: str, repo: str, index: int) -> List[dict]:
         """description:Get all labels on an issue
+        tags:label,issue
         owner:Owner of the repository
         repo:Name of the repository
         index:Index of the issue to get the labels from
@@ -159,11 +515,12 @@ class GiteaTools:
             for itm in self._issue.issue_get_labels(owner=owner, repo=repo, index=index)
         ]
 
-    @tool
+    @tool(mutates=True)
     def add_labels(
         self, owner: str, repo: str, index: int, labels: List[int]
     ) -> List[dict]:
         """description:Add one or more labels to an issue
+        tags:label,issue
         owner:Owner of the repository
         repo:Name of the repository
         index:Index of the issue to add label(s) to
@@ -177,20 +534,24 @@ class GiteaTools:
             )
         ]
 
-    @tool
+    @tool(mutates=True)
     def remove_labels(
         self, owner: str, repo: str, index: int, labels: List[int]
     ) -> dict:
         """description:Remove one or more labels from an issue
+        tags:label,issue
         owner:Owner of the repository
         repo:Name of the repository
         index:Index of the issue to add label(s) to
         labels:List of label IDs to remove from the issue
-        required:owner,repo,index,label"""
-        self._issue.issue_remove_label(owner=owner, repo=repo, index=index, id=id)
+        required:owner,repo,index,labels"""
+        for label in labels:
+            self._issue.issue_remove_label(
+                owner=owner, repo=repo, index=index, id=label
+            )
         return {"result": "success"}
 
-    @tool
+    @tool(mutates=True)
     def create_label(
         self,
         owner: str,
@@ -199,7 +560,8 @@ class GiteaTools:
         name: str = None,
         descr: str = None,
     ) -> dict:
-        """desscription:Create a label on a repository
+        """description:Create a label on a repository
+        tags:label
         required:owner,repo,color,name"""
         body = giteapy.CreateLabelOption(
             **{
@@ -212,9 +574,30 @@ class GiteaTools:
             owner=owner, repo=repo, body=body
         ).to_dict()
 
-    @tool
+    @tool(mutates=True)
+    def create_labels(self, owner: str, repo: str, labels: List[dict]) -> dict:
+        """description:Create many labels on a repository in one call, reporting success or failure per label
+        tags:label
+        owner:Owner of the repository
+        repo:Name of the repository
+        labels:One object per label with its name, color and optional descr
+        required:owner,repo,labels"""
+        return self._batch("create_label", owner, repo, labels)
+
+    @tool(mutates=True)
+    def label_issues(self, owner: str, repo: str, changes: List[dict]) -> dict:
+        """description:Add labels to many issues of a repository in one call, reporting success or failure per issue
+        tags:label,issue
+        owner:Owner of the repository
+        repo:Name of the repository
+        changes:One object per issue with its index and the list of label IDs to add as labels
+        required:owner,repo,changes"""
+        return self._batch("add_labels", owner, repo, changes)
+
+    @tool(mutates=True)
     def delete_label(self, owner: str, repo: str, id: int) -> dict:
         """description:Delete a label from a repository
+        tags:label
         owner:Owner of the repository
         repo:Name of the repository
         id:ID of the label to delete
@@ -222,34 +605,42 @@ class GiteaTools:
         self._issue.issue_delete_label(owner=owner, repo=repo, id=id)
         return {"result": "success"}
 
-    @tool
-    def list_milestones(self, owner: str, repo: str, state: str = "open") -> List[str]:
+    @tool(ttl=300)
+    def list_milestones(
+        self, owner: str, repo: str, state: str = "open", limit: int = None
+    ) -> List[str]:
         """description:List milestones for a repository
+        tags:milestone
         owner:Owner of the repository
         repo:Name of the repository
         state:State of the milestones; enum:open,closed,all; default:open
+        limit:Maximum number of milestones to return, all of them when unset
         required:owner,repo"""
-        return [
-            itm.to_dict()
-            for itm in self._issue.issue_get_milestones_list(
-                owner=owner, repo=repo, state=state
+        return list(
+            self._pages(
+                "/repos/{owner}/{repo}/milestones",
+                {"owner": owner, "repo": repo},
+                limit=limit,
+                state=state,
             )
-        ]
+        )
 
-    @tool
+    @tool(ttl=300)
     def get_milestone(self, owner: str, repo: str, id: int) -> dict:
         """description:Get a single milestone from a repository
+        tags:milestone
         owner:Owner of the repository
         repo:Name of the repository
         id:ID of the milestone to get
         required:owner,repo,id"""
         return self._issue.issue_get_milestone(owner=owner, repo=repo, id=id).to_dict()
 
-    @tool
+    @tool(mutates=True)
     def create_milestone(
         self, owner: str, repo: str, descr: str, due_on: str, title: str
     ) -> dict:
         """description:Create a milestone on a repository
+        tags:milestone
         owner:Owner of the repository
         repo:Name of the repository
         descr:The description of the milestone
@@ -263,9 +654,10 @@ class GiteaTools:
             owner=owner, repo=repo, body=body
         ).to_dict()
 
-    @tool
+    @tool(mutates=True)
     def delete_milestone(self, owner: str, repo: str, id: int) -> dict:
         """description:Delete a milestone from a repository
+        tags:milestone
         owner:Owner of the repository
         repo:Name of the repository
         id:ID of the milestone to delete
@@ -279,35 +671,34 @@ class GiteaTools:
         owner: str,
         repo: str,
         labels: str = None,
-        page: int = 0,
+        limit: int = None,
         q: str = None,
         state: str = "open",
     ) -> List[dict]:
         """description:list open and/or closed issues on a repository
+        tags:issue,pr
         owner:Owner of the repository
         repo:Name of the repository
         state:State of the issue to create; enum:open,closed,all; default:open
         labels:comma separated list of labels to filter by
-        page:page number of requested issues; default:0;
+        limit:Maximum number of issues to return, all of them when unset
         q:search string
         required:owner,repo"""
-        kwargs = {
-            k: v
-            for k, v in {
-                "owner": owner,
-                "repo": repo,
-                "labels": labels,
-                "page": page,
-                "q": q,
-                "state": state,
-            }.items()
-            if v is not None
-        }
-        return [issue.to_dict() for issue in self._issue.issue_list_issues(**kwargs)]
+        return list(
+            self._pages(
+                "/repos/{owner}/{repo}/issues",
+                {"owner": owner, "repo": repo},
+                limit=limit,
+                labels=labels,
+                q=q,
+                state=state,
+            )
+        )
 
     @tool
     def get_issue(self, owner: str, repo: str, index: int) -> dict:
         """description:Get a single issue from a repository
+        tags:issue,pr
         owner:Owner of the repository
         repo:Name of the repository
         index:Index of the issue to get
@@ -316,21 +707,22 @@ class GiteaTools:
             owner=owner, repo=repo, index=index
         ).to_dict()
 
-    @tool
+    @tool(mutates=True)
     def edit_issue(
         self,
         owner: str,
         repo: str,
         index: int,
-        assignee: str,
-        assignees: List[str],
-        body: str,
-        due_date: str,
-        milestone: int,
-        state: str,
-        title: str,
+        assignee: str = None,
+        assignees: List[str] = None,
+        body: str = None,
+        due_date: str = None,
+        milestone: int = None,
+        state: str = None,
+        title: str = None,
     ) -> dict:
         """description:Modify an existing issue
+        tags:issue,assign
         owner:Owner of the repository
         repo:Name of the repository
         index:Index of the issue to close
@@ -353,11 +745,14 @@ class GiteaTools:
                 "title": title,
             }
         )
-        return self._issue.issue_edit_issue(owner, repo, index, body).to_dict()
+        return self._issue.issue_edit_issue(
+            owner=owner, repo=repo, index=index, body=body
+        ).to_dict()
 
-    @tool
+    @tool(mutates=True)
     def close_issue(self, owner: str, repo: str, index: int) -> dict:
         """description:Close a given issue
+        tags:issue
         owner:Owner of the repository
         repo:Name of the repository
         index:Index of the issue to close
@@ -367,19 +762,27 @@ class GiteaTools:
             owner=owner, repo=repo, index=index, body=body
         ).to_dict()
 
-    @tool
-    def close_issues(self, owner: str, repo: str, indexes: List[int]) -> List[dict]:
+    @tool(mutates=True)
+    def close_issues(self, owner: str, repo: str, indexes: List[int]) -> dict:
         """description:Close multiple issues
+        tags:issue
         owner:Owner of the repository
         repo:Name of the repository
-        indexes:Index of the issue to close
+        indexes:Indexes of the issues to close
         required:owner,repo,indexes"""
-        retv = []
-        for n in indexes:
-            retv.append(self.close_issue(owner, repo, n))
-        return retv
+        return self._batch("close_issue", owner, repo, [{"index": n} for n in indexes])
 
-    @tool
+    @tool(mutates=True)
+    def edit_issues(self, owner: str, repo: str, edits: List[dict]) -> dict:
+        """description:Modify many issues of a repository in one call, reporting success or failure per issue
+        tags:issue,assign
+        owner:Owner of the repository
+        repo:Name of the repository
+        edits:One object per issue with its index and any of the edit_issue fields to change (assignee, assignees, body, due_date, milestone, state, title)
+        required:owner,repo,edits"""
+        return self._batch("edit_issue", owner, repo, edits)
+
+    @tool(mutates=True)
     def create_issue(
         self,
         owner: str,
@@ -394,6 +797,7 @@ class GiteaTools:
         title: str = None,
     ) -> dict:
         """description:Create an issue on a repository
+        tags:issue,assign
         owner:Owner of the repository
         repo:Name of the repository
         assignee:Name of the assigned user
@@ -425,5 +829,120 @@ class GiteaTools:
             owner=owner, repo=repo, body=body
         ).to_dict()
 
+    @tool(mutates=True)
+    def create_issues(self, owner: str, repo: str, issues: List[dict]) -> dict:
+        """description:Create many issues on a repository in one call, reporting success or failure per issue
+        tags:issue,assign
+        owner:Owner of the repository
+        repo:Name of the repository
+        issues:One object per issue with the create_issue fields (title, body, assignee, assignees, labels, milestone, due_date, closed), title is required
+        required:owner,repo,issues"""
+        return self._batch("create_issue", owner, repo, issues)
+
+    @tool(requires="_store")
+    def sync_store(self) -> dict:
+        """description:Refresh the local issue index with issues, pull requests, labels and milestones changed since the last sync
+        tags:search"""
+        errors = []
+        with self._syncLock:
+            repos = list(self._pages("/user/subscriptions"))
+            synced = [self._store.synced_at(r["full_name"]) for r in repos]
+            # issues, labels and milestones of every repo in a single fan-out
+            specs = []
+            for r, since in zip(repos, synced):
+                params = {"owner": r["owner"]["login"], "repo": r["name"]}
+                specs += [
+                    (
+                        "/repos/{owner}/{repo}/issues",
+                        params,
+                        {"state": "all", "since": since},
+                    ),
+                    ("/repos/{owner}/{repo}/labels", params, {}),
+                    ("/repos/{owner}/{repo}/milestones", params, {"state": "all"}),
+                ]
+            results = self._listings(specs)
+            for i, (r, since) in enumerate(zip(repos, synced)):
+                (issues, err), (labels, err2), (milestones, err3) = results[
+                    3 * i : 3 * i + 3
+                ]
+                if err or err2 or err3:
+                    errors.append(
+                        {"repo": r["full_name"], "error": _reason(err or err2 or err3)}
+                    )
+                    continue
+                # track the newest update the server reported rather than our own clock
+                since = max([since or ""] + [n["updated_at"] for n in issues]) or None
+                self._store.save(r["full_name"], since, issues, labels, milestones)
+        return {"repositories": len(repos), "errors": errors, **self._store.stats()}
+
+    @tool(requires="_store")
+    def search_issues(
+        self, q: str, repo: str = None, state: str = "all", limit: int = 20
+    ) -> List[dict]:
+        """description:Full-text search of issue and pull request titles and bodies in the local index, best matches first
+        tags:search,issue,pr
+        q:Search terms, with prefix* matches, "exact phrases", AND, OR and NOT
+        repo:Only search this repository, as owner/name
+        state:State of the issues; enum:open,closed,all; default:all
+        limit:Maximum number of results; default:20
+        required:q"""
+        return self._store.search(q, repo=repo, state=state, limit=limit)
+
+    @tool(requires="_store")
+    def filter_issues(
+        self,
+        repo: str = None,
+        state: str = "open",
+        kind: str = "all",
+        label: str = None,
+        milestone: str = None,
+        assignee: str = None,
+        author: str = None,
+        limit: int = 50,
+    ) -> List[dict]:
+        """description:List issues and pull requests from the local index across all repositories, most recently updated first
+        tags:search,issue,pr,assign
+        repo:Only list this repository, as owner/name
+        state:State of the issues; enum:open,closed,all; default:open
+        kind:Issues, pull requests or both; enum:issue,pull,all; default:all
+        label:Name of a label the issue must carry
+        milestone:Title of the milestone the issue belongs to
+        assignee:Login of a user assigned to the issue
+        author:Login of the user who opened the issue
+        limit:Maximum number of results; default:50"""
+        return self._store.filter(
+            limit=limit,
+            repo=repo,
+            state=state,
+            kind=kind,
+            label=label,
+            milestone=milestone,
+            assignee=assignee,
+            author=author,
+        )
+
+    @tool(requires="_store")
+    def aggregate_issues(
+        self,
+        group_by: str,
+        repo: str = None,
+        state: str = "open",
+        kind: str = "all",
+        label: str = None,
+        assignee: str = None,
+    ) -> List[dict]:
+        """description:Count issues and pull requests in the local index grouped by a field
+        tags:search,aggregate,issue,pr
+        group_by:Field to group by; enum:repo,state,kind,author,milestone,label,assignee
+        repo:Only count this repository, as owner/name
+        state:State of the issues; enum:open,closed,all; default:open
+        kind:Issues, pull requests or both; enum:issue,pull,all; default:all
+        label:Name of a label the issue must carry
+        assignee:Login of a user assigned to the issue
+        required:group_by"""
+        return self._store.aggregate(
+            group_by, repo=repo, state=state, kind=kind, label=label, assignee=assignee
+        )
+
 
 # create a new high priority issue for a bug on thwap-iac/test-repo titled 'socket interface causing segfault'
@@ -0,0 +1,200 @@
+# Stdlib
+import asyncio
+import random
+import threading
+import time
+
+# Internal
+from .utils import opt
+
+# one governor per host, shared by every client and profile talking to it
+_hosts = {}
+_hostsLock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def retry_after(headers, default=0.0) -> float:
+    """Seconds a Retry-After header asks for, or default when absent or a date"""
+    try:
+        return max(float((headers or {}).get("Retry-After", None)), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def governor(host, profile=None, classify=None, **defaults) -> "Governor":
+    """The Governor for host, created from the profile's settings on first use
+
+    The first profile to reach a host sets its limits; keyword arguments
+    are defaults for keys missing from the profile."""
+    with _hostsLock:
+        if host not in _hosts:
+            _hosts[host] = Governor(
+                host,
+                classify,
+                **{
+                    k: opt(profile, k, v)
+                    for k, v in dict(Governor.DEFAULTS, **defaults).items()
+                },
+            )
+        return _hosts[host]
+
+
+class Governor:
+    """Token-bucket rate limit, jittered retries and a circuit breaker for one host
+
+    classify(err) tells transient failures (timeouts, 429, 5xx) from the
+    rest: it returns None for errors that are the caller's problem, or the
+    seconds the server asked us to wait (0 when it didn't say). Only
+    transient failures are retried, and only those count towards opening
+    the circuit; after breaker_failures of them in a row every call fails
+    fast for breaker_cooldown seconds, then a single trial call decides
+    whether it closes again."""
+
+    DEFAULTS = {
+        "rate_limit": 0.0,
+        "rate_burst": 10,
+        "retries": 3,
+        "retry_backoff": 0.5,
+        "retry_max_backoff": 8.0,
+        "breaker_failures": 5,
+        "breaker_cooldown": 30.0,
+    }
+
+    def __init__(self, name, classify=None, **settings):
+        settings = dict(self.DEFAULTS, **settings)
+        self.name = name
+        self._classify = classify or (lambda err: None)
+        self._rate = settings["rate_limit"]
+        self._burst = settings["rate_burst"]
+        self._retries = settings["retries"]
+        self._backoff = settings["retry_backoff"]
+        self._maxBackoff = settings["retry_max_backoff"]
+        self._threshold = settings["breaker_failures"]
+        self._cooldown = settings["breaker_cooldown"]
+
+        self._lock = threading.Lock()
+        self._tokens = float(self._burst)
+        self._stamp = time.monotonic()
+        self._failures = 0
+        self._opened = None
+        self._trial = False
+
+        self.throttled = 0.0
+        self.retried = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def call(self, fn, retry=True):
+        """Return fn(), throttled, retried and guarded by the breaker
+
+        retry is whether fn is safe to repeat: True for idempotent calls, or
+        a predicate deciding per error (a 429 is safe to repeat for any
+        request, since the server never processed it)."""
+        attempt = 0
+        while True:
+            self._admit()
+            time.sleep(self._reserve())
+            try:
+                retv = fn()
+            except Exception as err:
+                attempt += 1
+                time.sleep(self._backoff_for(err, retry, attempt))
+                continue
+            self._record(True)
+            return retv
+
+    async def acall(self, fn, retry=True):
+        """call() for coroutines: await fn(), sleeping without blocking the loop"""
+        attempt = 0
+        while True:
+            self._admit()
+            await asyncio.sleep(self._reserve())
+            try:
+                retv = await fn()
+            except Exception as err:
+                attempt += 1
+                await asyncio.sleep(self._backoff_for(err, retry, attempt))
+                continue
+            self._record(True)
+            return retv
+
+    def _backoff_for(self, err, retry, attempt) -> float:
+        """Seconds to wait before retry number attempt, or re-raise err"""
+        wait = self._classify(err)
+        if wait is None:
+            self._record(True)
+            raise err
+        self._record(False)
+        safe = retry(err) if callable(retry) else retry
+        # a server asking for a long pause is better left to the breaker
+        if not safe or attempt > self._retries or wait > self._maxBackoff:
+            raise err
+        self.retried += 1
+        cap = min(self._maxBackoff, self._backoff * 2 ** (attempt - 1))
+        return max(wait, random.uniform(0, cap))
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long to wait before it is really ours"""
+        if self._rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._burst, self._tokens + (now - self._stamp) * self._rate
+            )
+            self._stamp = now
+            # reserve a token even when there is none, so waiters queue in order
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+            self.throttled += wait
+        return wait
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._opened is None:
+                return
+            remaining = self._cooldown - (time.monotonic() - self._opened)
+            if remaining <= 0 and not self._trial:
+                # half open: this call is the trial
+                self._trial = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(
+            f"{self.name} is failing, not calling it for another "
+            f"{max(remaining, 0):.0f}s"
+        )
+
+    def _record(self, ok) -> None:
+        with self._lock:
+            if ok:
+                self._failures = 0
+                self._opened = None
+                self._trial = False
+                return
+            self._failures += 1
+            if self._trial or (
+                self._opened is None and self._failures >= self._threshold > 0
+            ):
+                self._opened = time.monotonic()
+                self._trial = False
+                self.trips += 1
+
+    def state(self) -> str:
+        with self._lock:
+            if self._opened is None:
+                return "closed"
+            if self._trial or time.monotonic() - self._opened >= self._cooldown:
+                return "half-open"
+            return "open"
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state(),
+            "throttled": round(self.throttled, 2),
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "trips": self.trips,
+        }
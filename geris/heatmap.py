@@ -0,0 +1,122 @@
+# Stdlib
+import datetime
+import json
+import os
+import threading
+import time
+from typing import List
+
+# Internal
+from .gitea import GiteaTools
+
+DAYS = 365
+# days kept in the cache, enough to show last year in full
+KEEP = 3 * DAYS
+
+
+class Heatmap:
+    """A user's contributions per day, kept on disk between launches
+
+    load() shows the last known counts without touching the network.
+    refresh() fetches the heatmap again, but only days from the last
+    fetch on are taken from it: earlier days can't change, and Gitea only
+    returns the last year, so older days are only known from the cache."""
+
+    def __init__(self, tools: GiteaTools, path, key):
+        self._tools = tools
+        self._path = os.path.expanduser(path) if path else None
+        self._key = key
+        self._lock = threading.Lock()
+        self.user = None
+        self.fetched = None
+        self.days = {}
+
+    def load(self) -> bool:
+        """Read the cached counts; False when there are none yet"""
+        if not self._path:
+            return False
+        try:
+            with open(self._path) as fp:
+                data = json.load(fp).get(self._key, None)
+        except (OSError, ValueError, AttributeError):
+            return False
+        if not isinstance(data, dict):
+            return False
+        with self._lock:
+            self.user = data.get("user", None)
+            self.fetched = data.get("fetched", None)
+            self.days = {
+                datetime.date.fromisoformat(k): v
+                for k, v in (data.get("days", None) or {}).items()
+            }
+        return True
+
+    def refresh(self) -> int:
+        """Fetch the heatmap and merge the days since the last fetch, saving them"""
+        user = self._tools.default_user()
+        fresh = {}
+        for n in self._tools.get_heatmap_data(user):
+            # Gitea buckets contributions in 15 minute steps, several per day
+            day = datetime.date.fromtimestamp(n["timestamp"])
+            fresh[day] = fresh.get(day, 0) + (n["contributions"] or 0)
+
+        now = time.time()
+        with self._lock:
+            if self.user != user or self.fetched is None:
+                since = datetime.date.min
+            else:
+                # the day of the last fetch was still in progress then
+                since = datetime.date.fromtimestamp(self.fetched)
+            days = {k: v for k, v in self.days.items() if k < since}
+            days.update({k: v for k, v in fresh.items() if k >= since})
+            oldest = datetime.date.fromtimestamp(now) - datetime.timedelta(KEEP)
+            self.days = {k: v for k, v in days.items() if k >= oldest}
+            self.user, self.fetched = user, now
+            changed = sum(1 for k in fresh if k >= since)
+        self._save()
+        return changed
+
+    def _save(self) -> None:
+        # other hosts and users share the file, so only replace our own entry
+        if not self._path:
+            return
+        try:
+            with open(self._path) as fp:
+                data = json.load(fp)
+            if not isinstance(data, dict):
+                data = {}
+        except (OSError, ValueError):
+            data = {}
+        with self._lock:
+            data[self._key] = {
+                "user": self.user,
+                "fetched": self.fetched,
+                "days": {k.isoformat(): v for k, v in sorted(self.days.items())},
+            }
+        try:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            with open(f"{self._path}.{os.getpid()}", "w") as fp:
+                json.dump(data, fp)
+            os.replace(f"{self._path}.{os.getpid()}", self._path)
+        except OSError:
+            pass
+
+    def series(self, year=None, today=None) -> List[int]:
+        """365 daily counts: the days of year, or the last 365 ending today
+
+        One pass drops each known day into its slot of a zeroed array; in a
+        leap year December 31st shares the last slot."""
+        today = today or datetime.date.today()
+        if year is None:
+            first, last = today - datetime.timedelta(DAYS - 1), today
+        else:
+            first, last = datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+        first, last = first.toordinal(), last.toordinal()
+
+        retv = [0] * DAYS
+        with self._lock:
+            for day, count in self.days.items():
+                n = day.toordinal()
+                if first <= n <= last:
+                    retv[min(n - first, DAYS - 1)] += count
+        return retv
@@ -0,0 +1,110 @@
+# Stdlib
+import functools
+import json
+from typing import List
+
+# 3rd party, optional: exact token counts when available
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# per-message framing the chat format adds on top of the content
+OVERHEAD = 4
+# characters of an old tool result kept when it is shortened
+SHORTENED = 200
+
+
+class History:
+    """Conversation kept across prompts and trimmed to a token budget
+
+    Each prompt works on a copy from start_turn(); only turns that finish
+    are committed back, so a cancelled turn can't leave half a tool
+    exchange behind. When over budget, tool results outside the last
+    keep_turns prompts are shortened first, oldest first; whole turns are
+    only dropped if that isn't enough."""
+
+    def __init__(self, system, model=None, budget=16000, keep_turns=2):
+        self._system = {"role": "system", "content": system}
+        self._budget = budget
+        self._keep = keep_turns
+        self._count = _counter(model)
+        self.messages = [self._system]
+
+    def reset(self) -> None:
+        self.messages = [self._system]
+
+    def tokens(self, messages=None) -> int:
+        total = 0
+        for msg in self.messages if messages is None else messages:
+            total += OVERHEAD + self._count(msg.get("content", None) or "")
+            for call in msg.get("tool_calls", None) or []:
+                total += self._count(json.dumps(call["function"]))
+        return total
+
+    def start_turn(self, prompt) -> List[dict]:
+        self.messages = self._fit(self.messages)
+        return self.messages + [{"role": "user", "content": prompt}]
+
+    def commit(self, messages) -> None:
+        # drop a trailing tool request whose results never arrived
+        while messages and messages[-1].get("tool_calls", None):
+            messages = messages[:-1]
+        self.messages = messages
+
+    def _fit(self, messages) -> List[dict]:
+        if self.tokens(messages) <= self._budget:
+            return messages
+
+        users = [i for i, m in enumerate(messages) if m["role"] == "user"]
+        if self._keep <= 0:
+            recent = len(messages)
+        else:
+            recent = users[-self._keep] if len(users) >= self._keep else 0
+        names = {
+            call["id"]: call["function"]["name"]
+            for m in messages
+            for call in m.get("tool_calls", None) or []
+        }
+
+        messages = list(messages)
+        total = self.tokens(messages)
+        for i, msg in enumerate(messages[:recent]):
+            if total <= self._budget:
+                return messages
+            if msg["role"] != "tool" or len(msg["content"]) <= 2 * SHORTENED:
+                continue
+            name = names.get(msg["tool_call_id"], "the tool")
+            short = dict(
+                msg,
+                content=msg["content"][:SHORTENED]
+                + f"... [shortened to save context; call {name} again for the rest]",
+            )
+            total += self._count(short["content"]) - self._count(msg["content"])
+            messages[i] = short
+
+        # still over: drop the oldest turns, keeping the system prompt
+        while total > self._budget and len(users) > self._keep and len(users) > 1:
+            start, end = users[0], users[1]
+            total -= self.tokens(messages[start:end])
+            messages = messages[:start] + messages[end:]
+            users = [n - (end - start) for n in users[1:]]
+        return messages
+
+
+def _counter(model):
+    encoding = None
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+
+    @functools.lru_cache(maxsize=4096)
+    def count(text) -> int:
+        if encoding is None:
+            # ~4 characters per token for English text and JSON
+            return len(text) // 4 + 1
+        return len(encoding.encode(text))
+
+    return count
@@ -0,0 +1,127 @@
+# Stdlib
+import atexit
+import os
+import queue
+import threading
+
+
+class LogWriter:
+    """Append to log files from a background thread instead of the caller's
+
+    write() only queues the text; the writer thread drains the queue in
+    batches, opening each file once per batch. A file that grows past
+    max_bytes is rotated to name.1 … name.<backups>. When the queue is full
+    (the disk can't keep up) lines are dropped and counted rather than
+    slowing down the caller.
+
+    A text can carry once lines, (key, line) pairs written ahead of it
+    unless their key is already in the current file. The writer knows
+    when it rotates, so a text and the once lines it refers to always
+    end up in the same file."""
+
+    def __init__(self, max_bytes=10 * 1024 * 1024, backups=3, queue_size=10000):
+        self._max = max_bytes
+        self._backups = backups
+        self._queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.written = 0
+        # per path, the once keys written since it was last rotated
+        self._seen = {}
+        self._thread = threading.Thread(target=self._run, name="log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, path, text, once=()) -> None:
+        try:
+            self._queue.put_nowait((path, text, once))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Block until everything written so far is on disk"""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put((None, None, None))
+            self._thread.join(5)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # take whatever else piled up while the last batch was written
+            try:
+                while len(batch) < 1000:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            files = {}
+            stop = False
+            for path, text, once in batch:
+                if path is None:
+                    stop = True
+                else:
+                    files.setdefault(path, []).append((text, once))
+            for path, entries in files.items():
+                try:
+                    self._append(path, entries)
+                except OSError:
+                    self.dropped += len(entries)
+                    # unsure what made it to disk, so write every key again
+                    self._seen.pop(path, None)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _append(self, path, entries) -> None:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        seen = self._seen.setdefault(path, set())
+        chunk = []
+        for text, once in entries:
+            full = _prefixed(seen, text, once)
+            if self._max > 0 and size + len(full) > self._max and (size or chunk):
+                self._write(path, chunk)
+                self._rotate(path)
+                size, chunk = 0, []
+                # the new file has none of the once lines yet
+                seen.clear()
+                full = _prefixed(seen, text, once)
+            seen.update(key for key, _ in once)
+            chunk.append(full)
+            size += len(full)
+        self._write(path, chunk)
+
+    def _write(self, path, chunk) -> None:
+        if chunk:
+            with open(path, "a") as fp:
+                fp.write("".join(chunk))
+            self.written += sum(len(n) for n in chunk)
+
+    def _rotate(self, path) -> None:
+        if self._backups <= 0:
+            os.remove(path)
+            return
+        for n in range(self._backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{n}"):
+                os.replace(f"{path}.{n}", f"{path}.{n + 1}")
+        os.replace(path, f"{path}.1")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+def _prefixed(seen, text, once) -> str:
+    """text, preceded by each once line whose key isn't in seen yet"""
+    done, parts = set(seen), []
+    for key, line in once:
+        if key not in done:
+            done.add(key)
+            parts.append(line)
+    parts.append(text)
+    return "".join(parts)
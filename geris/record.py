@@ -0,0 +1,420 @@
+# Stdlib
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import List
+from urllib.parse import urlsplit
+
+# 3rd party
+from giteapy.rest import ApiException
+from urllib3._collections import HTTPHeaderDict
+
+# Internal
+from .client import Response
+from .logwriter import LogWriter
+
+INDEX = "session.jsonl"
+# stages compared between a recorded turn and its replay
+STAGES = ("llm", "tools", "render", "http", "total")
+# chat request arguments that don't change what is asked
+VOLATILE = ("stream", "request_timeout")
+# query parameters carrying credentials: giteapy sends the token as one
+CREDENTIALS = ("access_token", "token")
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _canonical(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+class Session:
+    """A recording of every Gitea exchange and model call of one session
+
+    The directory holds session.jsonl, one line per exchange or finished
+    turn in the order they happened, and objects/, where each request and
+    response body is stored once under its sha256, so repeats of the same
+    listing or the same model reply take no extra space.
+
+    Replaying serves Gitea responses by method, path, query and body, in
+    recorded order per request, and model replies in recorded order, so a
+    session runs again with no network at all. Replies are immediate
+    unless timing is set, which waits as long as the recording did."""
+
+    def __init__(self, path, replay=False, timing=False):
+        self.path = os.path.expanduser(path)
+        self.replaying = replay
+        self._timing = timing
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.turns = []
+        self.replayed = []
+        self.misses = 0
+        self.diverged = 0
+        if replay:
+            self._load()
+        else:
+            os.makedirs(os.path.join(self.path, "objects"), exist_ok=True)
+            # unbounded and never rotated: a recording can't drop lines
+            self._index = LogWriter(max_bytes=0, queue_size=0)
+
+    # -- store -------------------------------------------------------------
+
+    def _object(self, digest) -> str:
+        return os.path.join(self.path, "objects", digest[:2], digest)
+
+    def put(self, data: bytes) -> str:
+        """Store data under its digest, once, returning the digest"""
+        digest = _digest(data)
+        path = self._object(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f"{path}.{threading.get_ident()}", "wb") as fp:
+                fp.write(data)
+            os.replace(f"{path}.{threading.get_ident()}", path)
+        return digest
+
+    @functools.lru_cache(maxsize=1024)
+    def get(self, digest) -> bytes:
+        with open(self._object(digest), "rb") as fp:
+            return fp.read()
+
+    def _write(self, entry) -> None:
+        with self._lock:
+            self._seq += 1
+            entry = dict(entry, seq=self._seq)
+        self._index.write(
+            os.path.join(self.path, INDEX), json.dumps(entry, default=str) + "\n"
+        )
+
+    def _load(self) -> None:
+        self._http = defaultdict(list)
+        self._llm = deque()
+        with open(os.path.join(self.path, INDEX)) as fp:
+            for line in fp:
+                entry = json.loads(line)
+                if entry["type"] == "http":
+                    self._http[entry["key"]].append(entry)
+                elif entry["type"] == "llm":
+                    self._llm.append(entry)
+                elif entry["type"] == "turn":
+                    self.turns.append(entry)
+        self._served = defaultdict(int)
+
+    def close(self) -> None:
+        if not self.replaying:
+            self._index.flush()
+
+    # -- gitea -------------------------------------------------------------
+
+    def attach(self, tools) -> None:
+        """Record or replay every HTTP exchange of a GiteaTools instance"""
+        aio = getattr(tools, "_aio", None)
+        if aio is not None:
+            # AsyncRESTClient and the native listings both send through here
+            aio.request = self._arequest(aio.request)
+        else:
+            rest = tools._client.rest_client
+            rest.request = self._request(rest.request)
+
+    @staticmethod
+    def _http_key(method, url, query, body) -> tuple:
+        # credentials stay out of the key, so a recording replays with any
+        # token; headers, Authorization included, never enter it
+        parts = urlsplit(url)
+        query = sorted(
+            (str(k), str(v).lower() if isinstance(v, bool) else str(v))
+            for k, v in (query or [])
+            if v is not None and str(k).lower() not in CREDENTIALS
+        )
+        request = {"method": method, "path": parts.path, "query": query}
+        if body is not None:
+            request["body"] = body
+        return _digest(_canonical(request)), f"{method} {parts.path}"
+
+    def _record_http(self, key, name, status, reason, headers, data, elapsed):
+        data = data if isinstance(data, (bytes, str)) else ""
+        data = data.encode() if isinstance(data, str) else data
+        self._write(
+            {
+                "type": "http",
+                "key": key,
+                "request": name,
+                "status": status,
+                "reason": reason,
+                "headers": dict(headers or {}),
+                "body": self.put(data) if data else None,
+                "elapsed": round(elapsed, 6),
+            }
+        )
+
+    def _replay_http(self, key, headers) -> tuple:
+        """The recorded entry to answer with, and how long the original took"""
+        with self._lock:
+            entries = self._http.get(key, None)
+            if not entries:
+                self.misses += 1
+                entry = None
+            else:
+                n = self._served[key]
+                self._served[key] = n + 1
+                entry = entries[min(n, len(entries) - 1)]
+                # a 304 only makes sense to a client that holds the body
+                if entry["status"] == 304 and "If-None-Match" not in (headers or {}):
+                    full = [e for e in entries if 200 <= e["status"] <= 299]
+                    entry = full[-1] if full else entry
+        if entry is None:
+            return None, 0.0
+        return entry, entry["elapsed"] if self._timing else 0.0
+
+    def _respond(self, entry, name):
+        if entry is None:
+            raise ApiException(status=404, reason=f"Not in the recording: {name}")
+        data = self.get(entry["body"]).decode() if entry["body"] else ""
+        resp = Response(
+            entry["status"], entry["reason"], data, HTTPHeaderDict(entry["headers"])
+        )
+        if not 200 <= resp.status <= 299:
+            raise ApiException(http_resp=resp)
+        return resp
+
+    def _request(self, send):
+        def request(method, url, query_params=None, headers=None, body=None, *a, **kw):
+            key, name = self._http_key(method, url, query_params, body)
+            if self.replaying:
+                entry, wait = self._replay_http(key, headers)
+                time.sleep(wait)
+                return self._respond(entry, name)
+            mark = time.perf_counter()
+            try:
+                resp = send(method, url, query_params, headers, body, *a, **kw)
+            except ApiException as e:
+                self._record_http(
+                    key,
+                    name,
+                    e.status,
+                    e.reason,
+                    e.headers,
+                    e.body,
+                    time.perf_counter() - mark,
+                )
+                raise
+            self._record_http(
+                key,
+                name,
+                resp.status,
+                resp.reason,
+                resp.getheaders(),
+                resp.data,
+                time.perf_counter() - mark,
+            )
+            return resp
+
+        return request
+
+    def _arequest(self, send):
+        async def request(method, url, query=None, headers=None, body=None):
+            key, name = self._http_key(method, url, query, body)
+            if self.replaying:
+                entry, wait = self._replay_http(key, headers)
+                await asyncio.sleep(wait)
+                return self._respond(entry, name)
+            mark = time.perf_counter()
+            try:
+                resp = await send(method, url, query, headers, body)
+            except ApiException as e:
+                self._record_http(
+                    key,
+                    name,
+                    e.status,
+                    e.reason,
+                    e.headers,
+                    e.body,
+                    time.perf_counter() - mark,
+                )
+                raise
+            self._record_http(
+                key,
+                name,
+                resp.status,
+                resp.reason,
+                resp.getheaders(),
+                resp.data,
+                time.perf_counter() - mark,
+            )
+            return resp
+
+        return request
+
+    # -- openai ------------------------------------------------------------
+
+    def chat(self, create):
+        """Wrap ChatCompletion.create to record or replay its replies"""
+
+        def wrapped(**kwargs):
+            key = _digest(
+                _canonical({k: v for k, v in kwargs.items() if k not in VOLATILE})
+            )
+            if self.replaying:
+                return self._replay_chat(key, kwargs.get("stream", False))
+            mark = time.perf_counter()
+            response = create(**kwargs)
+            request = self.put(_canonical(kwargs))
+            if kwargs.get("stream", False):
+                return self._record_stream(key, request, response, mark)
+            self._write(
+                {
+                    "type": "llm",
+                    "key": key,
+                    "request": request,
+                    "stream": False,
+                    "body": self.put(_canonical(response.to_dict_recursive())),
+                    "elapsed": round(time.perf_counter() - mark, 6),
+                }
+            )
+            return response
+
+        return wrapped
+
+    def _record_stream(self, key, request, stream, mark):
+        chunks = []
+        try:
+            for chunk in stream:
+                now = time.perf_counter()
+                chunks.append((round(now - mark, 6), chunk.to_dict_recursive()))
+                mark = now
+                yield chunk
+        finally:
+            self._write(
+                {
+                    "type": "llm",
+                    "key": key,
+                    "request": request,
+                    "stream": True,
+                    "body": self.put(_canonical(chunks)),
+                    "elapsed": round(sum(n[0] for n in chunks), 6),
+                }
+            )
+
+    def _replay_chat(self, key, stream):
+        with self._lock:
+            if not self._llm:
+                self.misses += 1
+                raise RuntimeError("The recording has no more model replies")
+            entry = self._llm.popleft()
+            # the agent asked something else than it did when recording
+            if entry["key"] != key:
+                self.diverged += 1
+        body = json.loads(self.get(entry["body"]))
+        if not entry["stream"]:
+            time.sleep(entry["elapsed"] if self._timing else 0.0)
+            return body if not stream else iter([_as_chunk(body)])
+        chunks = self._replay_chunks(body)
+        if stream:
+            return chunks
+        return _assemble(list(chunks))
+
+    def _replay_chunks(self, chunks):
+        for gap, chunk in chunks:
+            if self._timing:
+                time.sleep(gap)
+            yield chunk
+
+    # -- turns -------------------------------------------------------------
+
+    def turn(self, prompt, stats, breakdown, total) -> None:
+        """Note a finished turn: recorded, or compared against its recording"""
+        times = {
+            "llm": stats["llm"],
+            "tools": stats["tools"],
+            "render": stats["render"],
+            "http": breakdown.get("http", {}).get("seconds", 0.0),
+            "total": total,
+        }
+        times = {k: round(v, 4) for k, v in times.items()}
+        entry = {
+            "type": "turn",
+            "prompt": prompt,
+            "round_trips": stats["round_trips"],
+            "tool_calls": stats["tool_calls"],
+            "seconds": times,
+        }
+        if self.replaying:
+            self.replayed.append(entry)
+        else:
+            self._write(entry)
+
+    def prompts(self) -> List[str]:
+        return [n["prompt"] for n in self.turns]
+
+    def report(self) -> str:
+        """Recorded against replayed seconds per turn and stage"""
+        lines = [
+            f"{'turn':<6}{'stage':<8}{'recorded':>10}{'replayed':>10}{'diff':>10}",
+        ]
+        totals = {k: [0.0, 0.0] for k in STAGES}
+        for n, (rec, rep) in enumerate(zip(self.turns, self.replayed), 1):
+            for stage in STAGES:
+                a, b = rec["seconds"][stage], rep["seconds"][stage]
+                totals[stage][0] += a
+                totals[stage][1] += b
+                lines.append(f"{n:<6}{stage:<8}{a:>10.3f}{b:>10.3f}{b - a:>+10.3f}")
+            if (rec["round_trips"], rec["tool_calls"]) != (
+                rep["round_trips"],
+                rep["tool_calls"],
+            ):
+                lines.append(
+                    f"{n:<6}{'steps':<8}{rec['round_trips']}/{rec['tool_calls']} "
+                    f"round trips/tool calls recorded, "
+                    f"{rep['round_trips']}/{rep['tool_calls']} replayed"
+                )
+        for stage in STAGES:
+            a, b = totals[stage]
+            lines.append(f"{'all':<6}{stage:<8}{a:>10.3f}{b:>10.3f}{b - a:>+10.3f}")
+        lines.append(
+            f"{len(self.replayed)}/{len(self.turns)} turns replayed, "
+            f"{self.misses} requests not in the recording, "
+            f"{self.diverged} model requests that differ from it"
+        )
+        return "\n".join(lines)
+
+
+def _as_chunk(body) -> dict:
+    """A recorded non-streamed reply as the single chunk of a stream"""
+    message = body["choices"][0]["message"]
+    calls = message.get("tool_calls", None) or []
+    delta = dict(message, tool_calls=[dict(c, index=i) for i, c in enumerate(calls)])
+    return {"choices": [{"index": 0, "delta": delta}]}
+
+
+def _assemble(chunks) -> dict:
+    """A non-streamed reply from the chunks of a recorded stream"""
+    content, calls = [], {}
+    for chunk in chunks:
+        for choice in chunk.get("choices", None) or []:
+            delta = choice.get("delta", None) or {}
+            content.append(delta.get("content", None) or "")
+            for tc in delta.get("tool_calls", None) or []:
+                call = calls.setdefault(
+                    tc.get("index", 0),
+                    {
+                        "id": None,
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""},
+                    },
+                )
+                call["id"] = tc.get("id", None) or call["id"]
+                fn = tc.get("function", None) or {}
+                call["function"]["name"] += fn.get("name", None) or ""
+                call["function"]["arguments"] += fn.get("arguments", None) or ""
+    message = {"role": "assistant", "content": "".join(content) or None}
+    if calls:
+        message["tool_calls"] = [calls[i] for i in sorted(calls)]
+    return {"choices": [{"index": 0, "message": message}]}
@@ -0,0 +1,163 @@
+# Stdlib
+import re
+import threading
+from typing import List
+
+# Internal
+from .gitea import GiteaTools
+from .utils import func2tool
+
+# prompt words -> the tag or name word they stand for
+ALIASES = {
+    "ticket": "issue",
+    "bug": "issue",
+    "task": "issue",
+    "todo": "issue",
+    "pull": "pr",
+    "merge": "pr",
+    "tag": "label",
+    "categor": "label",
+    "priority": "label",
+    "find": "search",
+    "mention": "search",
+    "about": "search",
+    "count": "aggregate",
+    "many": "aggregate",
+    "breakdown": "aggregate",
+    "per": "aggregate",
+    "project": "repo",
+    "repository": "repo",
+    "organization": "org",
+    "organisation": "org",
+    "assigned": "assign",
+    "assignee": "assign",
+    "me": "user",
+    "my": "user",
+    "mine": "user",
+    "overview": "dashboard",
+    "summary": "dashboard",
+    "due": "milestone",
+    "release": "milestone",
+    "deadline": "milestone",
+}
+# words too common in tool descriptions to say anything about relevance
+STOP = {"a", "an", "the", "of", "to", "for", "and", "or", "in", "on", "by", "with"}
+STOP |= {"return", "all", "from", "any", "their", "them", "it", "is", "be", "as"}
+# tools offered on every request: the system prompt relies on them
+ALWAYS = ("default_user",)
+
+
+def request_tools(need: str) -> dict:
+    """description:Ask for tools that are not offered yet, call this when none of the available tools can do what is needed
+    need:What the missing tool should do, e.g. 'delete a milestone', leave empty to get every tool
+    """
+
+
+def _words(text) -> set:
+    retv = set()
+    for w in re.findall(r"[a-z0-9]+", text.lower()):
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        retv.add(ALIASES.get(w, w))
+    return retv - STOP
+
+
+class ToolRouter:
+    """Pick the tools worth sending with a prompt instead of the whole schema list
+
+    Each tool is scored by how many prompt words hit its tags (3 points),
+    its name (2) or its description (1), and tools scoring under half of
+    the best are dropped as incidental hits. The best max_tools are offered,
+    plus request_tools so the model can pull in anything that was left
+    out. A prompt that matches nothing gets every tool."""
+
+    def __init__(self, tools: GiteaTools, max_tools=12):
+        self._max = max_tools
+        self._schemas = {n["function"]["name"]: n for n in tools.tools()}
+        self._tags = tools.tags()
+        self._index = {
+            name: (
+                self._tags.get(name, set()),
+                _words(name.replace("_", " ")),
+                _words(n["function"].get("description", "")),
+                _words(" ".join(name.split("_")[1:])),
+            )
+            for name, n in self._schemas.items()
+        }
+        self.request_tool = func2tool(request_tools)
+
+    def match(self, text) -> List[str]:
+        """Tool names relevant to text, best first; empty when nothing matches"""
+        words = _words(text)
+        scores = {}
+        for name, (tags, parts, desc, _) in self._index.items():
+            score = 3 * len(words & tags) + 2 * len(words & parts) + len(words & desc)
+            if score:
+                scores[name] = score
+        best = max(scores.values(), default=0)
+        return sorted(
+            (k for k, v in scores.items() if 2 * v >= best),
+            key=lambda k: (-scores[k], k),
+        )
+
+    def select(self, prompt) -> "ToolSelection":
+        """Start the tool selection for one prompt"""
+        if self._max <= 0:
+            return ToolSelection(self, self._schemas)
+        names = self.match(prompt)[: self._max]
+        if not names:
+            return ToolSelection(self, self._schemas)
+        return ToolSelection(self, list(ALWAYS) + names)
+
+
+class ToolSelection:
+    """The tools offered during one prompt, growing as the turn goes on"""
+
+    def __init__(self, router: ToolRouter, names):
+        self._router = router
+        self._lock = threading.Lock()
+        self._names = {n for n in names if n in router._schemas}
+
+    def schemas(self) -> List[dict]:
+        r = self._router
+        with self._lock:
+            retv = [v for k, v in r._schemas.items() if k in self._names]
+            complete = len(self._names) == len(r._schemas)
+        return retv if complete else retv + [r.request_tool]
+
+    def _add(self, names) -> List[str]:
+        with self._lock:
+            added = [n for n in names if n in self._router._schemas]
+            added = [n for n in added if n not in self._names]
+            self._names.update(added)
+        return added
+
+    def used(self, name) -> None:
+        """Widen the selection around a tool the model just called
+
+        Tools sharing both a tag and a noun with it are likely next steps
+        (create_label after list_labels). A call to a tool that wasn't
+        offered is let through, and the tool is offered from then on."""
+        index = self._router._index
+        if name not in index:
+            return
+        tags, _, _, nouns = index[name]
+        self._add(
+            [name] + [k for k, v in index.items() if tags & v[0] and nouns & v[3]]
+        )
+
+    def request(self, need) -> dict:
+        """Handle a request_tools call: offer what matches need, or everything"""
+        r = self._router
+        names = r.match(need or "")[: max(r._max, 1)] if need else []
+        added = self._add(names or list(r._schemas))
+        if not added:
+            added = self._add(list(r._schemas))
+        return {
+            "added": added,
+            "note": (
+                "These tools are available from the next step on"
+                if added
+                else "Every tool is already available"
+            ),
+        }
@@ -0,0 +1,58 @@
+# Stdlib
+import threading
+
+# Internal
+from .gitea import GiteaTools
+
+
+class StatusCounts:
+    """Per-repo open issue, milestone and PR counts behind the status bar"""
+
+    def __init__(self, tools: GiteaTools):
+        self._tools = tools
+        self._lock = threading.Lock()
+        self._repos = {}
+        self._counts = {}
+        self._stale = set()
+        self.errors = []
+
+    def invalidate(self, owner, repo) -> None:
+        """Mark a repo for recounting on the next refresh"""
+        if owner and repo:
+            with self._lock:
+                self._stale.add(f"{owner}/{repo}".lower())
+
+    def refresh(self, full=False) -> dict:
+        """Recount stale repos (or every subscribed repo) and return the totals"""
+        if full or not self._repos:
+            repos = {
+                r["full_name"].lower(): r for r in self._tools.list_default_user_repos()
+            }
+            with self._lock:
+                self._repos = repos
+                self._counts = {k: v for k, v in self._counts.items() if k in repos}
+                self._stale = set(repos)
+
+        with self._lock:
+            names = [k for k in self._repos if k in self._stale]
+            self._stale.difference_update(names)
+
+        errors = []
+        results = self._tools.repo_counts([self._repos[k] for k in names])
+        with self._lock:
+            for name, (counts, err) in zip(names, results):
+                if err is None:
+                    self._counts[name] = counts
+                else:
+                    errors.append({"repo": name, "error": str(err)})
+                    self._stale.add(name)
+            self.errors = errors
+        return self.totals()
+
+    def totals(self) -> dict:
+        retv = {"issues": 0, "milestones": 0, "prs": 0}
+        with self._lock:
+            for counts in self._counts.values():
+                for k, v in counts.items():
+                    retv[k] += v
+        return retv
@@ -0,0 +1,250 @@
+# Stdlib
+import os
+import re
+import sqlite3
+import threading
+from typing import List
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    repo TEXT COLLATE NOCASE PRIMARY KEY, synced_at TEXT
+);
+CREATE TABLE IF NOT EXISTS issues (
+    repo TEXT COLLATE NOCASE, number INTEGER, id INTEGER, kind TEXT, state TEXT,
+    title TEXT, body TEXT, author TEXT, assignees TEXT, labels TEXT, milestone TEXT,
+    comments INTEGER, created_at TEXT, updated_at TEXT, closed_at TEXT, url TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE TABLE IF NOT EXISTS labels (
+    repo TEXT, id INTEGER, name TEXT, color TEXT, description TEXT,
+    PRIMARY KEY (repo, id)
+);
+CREATE TABLE IF NOT EXISTS milestones (
+    repo TEXT, id INTEGER, title TEXT, state TEXT, open_issues INTEGER,
+    closed_issues INTEGER, due_on TEXT,
+    PRIMARY KEY (repo, id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5(
+    repo UNINDEXED, number UNINDEXED, title, body
+);
+"""
+
+# aggregate_issues group -> SQL expression; labels and assignees are stored as
+# ",a,b," so a single row can fall into several groups
+GROUPS = {
+    "repo": "repo",
+    "state": "state",
+    "kind": "kind",
+    "author": "author",
+    "milestone": "milestone",
+}
+MULTI_GROUPS = {"label": "labels", "assignee": "assignees"}
+# "a phrase", a bare word (optionally a prefix*), or anything else
+TERMS = re.compile(r'"([^"]*)"?|([^\s"]+)')
+OPERATORS = {"AND", "OR", "NOT"}
+LIKE = re.compile(r"[\\%_]")
+
+
+class IssueStore:
+    """Local SQLite mirror of issues, pull requests, labels and milestones"""
+
+    def __init__(self, path):
+        path = os.path.expanduser(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.executescript(SCHEMA)
+
+    def _query(self, sql, params=()) -> List[dict]:
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def synced_at(self, repo):
+        rows = self._query("SELECT synced_at FROM repos WHERE repo = ?", (repo,))
+        return rows[0]["synced_at"] if rows else None
+
+    def save(self, repo, synced_at, issues, labels, milestones) -> None:
+        """Upsert one repo's changed issues and replace its labels and milestones"""
+        with self._lock, self._db:
+            for n in issues:
+                self._db.execute(
+                    "DELETE FROM issues_fts WHERE repo = ? AND number = ?",
+                    (repo, n["number"]),
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO issues VALUES"
+                    " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        repo,
+                        n["number"],
+                        n.get("id"),
+                        "pull" if n.get("pull_request") else "issue",
+                        n.get("state"),
+                        n.get("title"),
+                        n.get("body"),
+                        (n.get("user") or {}).get("login"),
+                        _joined(a.get("login") for a in n.get("assignees") or []),
+                        _joined(lbl.get("name") for lbl in n.get("labels") or []),
+                        (n.get("milestone") or {}).get("title"),
+                        n.get("comments"),
+                        n.get("created_at"),
+                        n.get("updated_at"),
+                        n.get("closed_at"),
+                        n.get("html_url"),
+                    ),
+                )
+                self._db.execute(
+                    "INSERT INTO issues_fts VALUES (?, ?, ?, ?)",
+                    (repo, n["number"], n.get("title"), n.get("body")),
+                )
+            self._db.execute("DELETE FROM labels WHERE repo = ?", (repo,))
+            self._db.executemany(
+                "INSERT INTO labels VALUES (?, ?, ?, ?, ?)",
+                [
+                    (repo, n["id"], n.get("name"), n.get("color"), n.get("description"))
+                    for n in labels
+                ],
+            )
+            self._db.execute("DELETE FROM milestones WHERE repo = ?", (repo,))
+            self._db.executemany(
+                "INSERT INTO milestones VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        repo,
+                        n["id"],
+                        n.get("title"),
+                        n.get("state"),
+                        n.get("open_issues"),
+                        n.get("closed_issues"),
+                        n.get("due_on"),
+                    )
+                    for n in milestones
+                ],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO repos VALUES (?, ?)", (repo, synced_at)
+            )
+
+    def search(self, q, repo=None, state=None, limit=20) -> List[dict]:
+        sql = (
+            "SELECT i.repo, i.number, i.kind, i.state, i.title, i.labels,"
+            " i.assignees, i.updated_at, snippet(issues_fts, -1, '**', '**', '...', 12)"
+            " AS snippet FROM issues_fts JOIN issues i"
+            " ON i.repo = issues_fts.repo AND i.number = issues_fts.number"
+            " WHERE issues_fts MATCH ?"
+        )
+        params = [_match(q)]
+        if repo:
+            sql += " AND i.repo = ?"
+            params.append(repo)
+        if state and state != "all":
+            sql += " AND i.state = ?"
+            params.append(state)
+        sql += " ORDER BY bm25(issues_fts) LIMIT ?"
+        params.append(limit)
+        return [_split(n) for n in self._query(sql, params)]
+
+    def filter(self, limit=50, **where) -> List[dict]:
+        sql, params = _where(where)
+        return [
+            _split(n)
+            for n in self._query(
+                "SELECT repo, number, kind, state, title, author, assignees, labels,"
+                " milestone, comments, updated_at, url FROM issues"
+                f"{sql} ORDER BY updated_at DESC LIMIT ?",
+                params + [limit],
+            )
+        ]
+
+    def aggregate(self, group_by, **where) -> List[dict]:
+        sql, params = _where(where)
+        if group_by in MULTI_GROUPS:
+            column = MULTI_GROUPS[group_by]
+            rows = self._query(f"SELECT {column} AS grp FROM issues{sql}", params)
+            counts = {}
+            for row in rows:
+                for name in _split_names(row["grp"]) or [None]:
+                    counts[name] = counts.get(name, 0) + 1
+            retv = [{group_by: k, "count": v} for k, v in counts.items()]
+            return sorted(retv, key=lambda n: -n["count"])
+        return self._query(
+            f"SELECT {GROUPS[group_by]} AS {group_by}, COUNT(*) AS count FROM issues"
+            f"{sql} GROUP BY 1 ORDER BY 2 DESC",
+            params,
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("repos", "issues", "labels", "milestones")
+            }
+
+
+def _joined(names) -> str:
+    names = [n for n in names if n]
+    return f",{','.join(names)}," if names else ""
+
+
+def _split_names(value) -> List[str]:
+    return [n for n in (value or "").split(",") if n]
+
+
+def _split(row) -> dict:
+    for key in ("labels", "assignees"):
+        if key in row:
+            row[key] = _split_names(row[key])
+    return row
+
+
+def _match(q) -> str:
+    """Free text as an FTS5 query: words and phrases quoted, AND/OR/NOT kept
+
+    Quoting keeps punctuation such as - or ? from being read as query
+    syntax; a trailing * still makes a word a prefix match. FTS5's NOT
+    only excludes from what comes before it, so a NOT with nothing to
+    exclude from is an error rather than dropped, which would search for
+    the very term meant to be left out."""
+    terms = []
+    for phrase, word in TERMS.findall(q or ""):
+        if word == "NOT" and terms[-1:] == ["AND"]:
+            # a AND NOT b is a NOT b
+            terms[-1] = word
+            continue
+        if word == "NOT" and (not terms or terms[-1] in OPERATORS):
+            raise ValueError(
+                "NOT needs terms before it to exclude from, e.g. 'crash NOT segfault'"
+            )
+        if word in OPERATORS:
+            # an operator needs a term on both sides
+            if terms and terms[-1] not in OPERATORS:
+                terms.append(word)
+            continue
+        text = phrase if phrase or not word else word
+        prefix = bool(word) and word.endswith("*") and len(word) > 1
+        text = text.rstrip("*") if prefix else text
+        # a term of only punctuation matches nothing and FTS5 rejects it
+        if not re.search(r"\w", text):
+            continue
+        terms.append('"' + text.replace('"', '""') + '"' + ("*" if prefix else ""))
+    while terms and terms[-1] in OPERATORS:
+        terms.pop()
+    return " ".join(terms) or '""'
+
+
+def _where(where):
+    clauses, params = [], []
+    for key, value in where.items():
+        if value is None or value == "all":
+            continue
+        if key in MULTI_GROUPS:
+            # a _ or % in a name is literal, not a wildcard
+            clauses.append(f"{MULTI_GROUPS[key]} LIKE ? ESCAPE '\\'")
+            params.append("%," + LIKE.sub(r"\\\g<0>", value) + ",%")
+        else:
+            clauses.append(f"{GROUPS[key]} = ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
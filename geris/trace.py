@@ -0,0 +1,187 @@
+# Stdlib
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# the span code is running in, carried into worker threads by submit()
+_current = contextvars.ContextVar("geris_span", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    """One timed operation: a turn, an LLM round trip, a tool call or a request"""
+
+    __slots__ = ("id", "parent", "turn", "kind", "name", "start", "end", "thread")
+    __slots__ += ("tid", "attrs", "_mark")
+
+    def __init__(self, kind, name, parent, attrs):
+        self.id = next(_ids)
+        self.parent = parent.id if parent else None
+        self.turn = parent.turn if parent else self.id
+        self.kind = kind
+        self.name = name
+        self.thread = threading.current_thread().name
+        self.tid = threading.get_ident()
+        self.attrs = attrs
+        self.start = time.time()
+        self.end = None
+        self._mark = time.perf_counter()
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start if self.end else 0.0
+
+    def to_dict(self) -> dict:
+        return dict(
+            {
+                "id": self.id,
+                "parent": self.parent,
+                "turn": self.turn,
+                "kind": self.kind,
+                "name": self.name,
+                "thread": self.thread,
+                "start": round(self.start, 6),
+                "duration": round(self.duration, 6),
+            },
+            **self.attrs,
+        )
+
+    def to_chrome(self) -> dict:
+        return {
+            "name": self.name,
+            "cat": self.kind,
+            "ph": "X",
+            "ts": int(self.start * 1e6),
+            "dur": int(self.duration * 1e6),
+            "pid": os.getpid(),
+            "tid": self.tid,
+            "args": dict(self.attrs, id=self.id, parent=self.parent),
+        }
+
+
+class Tracer:
+    """Finished spans of recent turns, optionally exported to a file
+
+    Spans nest through a context variable, so a tool's requests land under
+    the tool and the tool under its turn, across the threads and event loop
+    they run on. A path ending in .json is written as a Chrome trace (for
+    chrome://tracing or Perfetto) holding the last keep spans; anything
+    else gets JSON lines, appended at each flush()."""
+
+    def __init__(self, keep=20000):
+        self._spans = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._path = None
+        self._flushed = 0
+        self._count = 0
+
+    def export_to(self, path) -> None:
+        self._path = os.path.expanduser(path) if path else None
+
+    @contextlib.contextmanager
+    def span(self, kind, name=None, **attrs):
+        s = Span(kind, name or kind, _current.get(), attrs)
+        token = _current.set(s)
+        try:
+            yield s
+        except BaseException as e:
+            # a request that recorded its status is judged by that instead
+            if "status" not in s.attrs:
+                s.attrs.setdefault("error", f"{type(e).__name__}: {e}"[:200])
+            raise
+        finally:
+            s.end = s.start + time.perf_counter() - s._mark
+            _current.reset(token)
+            with self._lock:
+                self._spans.append(s)
+                self._count += 1
+
+    def spans(self, turn=None) -> list:
+        with self._lock:
+            return [s for s in self._spans if turn is None or s.turn == turn]
+
+    def breakdown(self, turn) -> dict:
+        """Where a turn's time went: calls, seconds and bytes per kind of span
+
+        Tool calls run concurrently, so their seconds can add up to more
+        than the turn took; slowest names the worst offenders."""
+        retv = {}
+        spans = [s for s in self.spans(turn) if s.id != turn]
+        for s in spans:
+            kind = retv.setdefault(s.kind, {"calls": 0, "seconds": 0.0})
+            kind["calls"] += 1
+            kind["seconds"] += s.duration
+            for key in ("bytes", "prompt_tokens", "completion_tokens"):
+                if key in s.attrs:
+                    kind[key] = kind.get(key, 0) + (s.attrs[key] or 0)
+            status = s.attrs.get("status", 200)
+            if s.attrs.get("error", None) or status == 0 or status >= 400:
+                kind["errors"] = kind.get("errors", 0) + 1
+        for kind in retv.values():
+            kind["seconds"] = round(kind["seconds"], 3)
+        retv["slowest"] = [
+            f"{s.kind} {s.name} {s.duration:.2f}s"
+            for s in sorted(spans, key=lambda s: -s.duration)
+            if s.kind in ("tool", "http")
+        ][:3]
+        return retv
+
+    def flush(self) -> None:
+        """Write spans finished since the last flush to the export file"""
+        if self._path is None:
+            return
+        with self._lock:
+            spans = list(self._spans)
+            fresh = min(self._count - self._flushed, len(spans))
+            self._flushed = self._count
+        if self._path.endswith(".json"):
+            tmp = f"{self._path}.tmp"
+            names = {s.tid: s.thread for s in spans}
+            events = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": k,
+                    "args": {"name": v},
+                }
+                for k, v in names.items()
+            ]
+            with open(tmp, "w") as fp:
+                json.dump({"traceEvents": events + [s.to_chrome() for s in spans]}, fp)
+            os.replace(tmp, self._path)
+            return
+        with open(self._path, "a") as fp:
+            for s in spans[len(spans) - fresh :]:
+                fp.write(json.dumps(s.to_dict(), default=str) + "\n")
+
+
+tracer = Tracer()
+
+
+def span(kind, name=None, **attrs):
+    """Time the with block as a span of the default tracer"""
+    return tracer.span(kind, name, **attrs)
+
+
+def submit(pool, fn, *args):
+    """pool.submit() that runs fn inside the caller's span"""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+async def carry(coro, parent):
+    """Await coro inside parent, a span from the thread that scheduled it"""
+    _current.set(parent)
+    return await coro
+
+
+def current():
+    return _current.get()
@@ -1,7 +1,9 @@
 # Stdlib
+import hashlib
 import json
 import os
 import sys
+import threading
 import time
 import traceback
 
@@ -10,20 +12,94 @@ import openai
 from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.pretty import Pretty
-from textual import on
+from textual import on, work
 from textual.app import App, ComposeResult
 from textual.containers import VerticalScroll, Horizontal, Vertical
 from textual.widgets import Footer, Header, Input
 from textual.widgets import Sparkline, Static, RichLog
+from textual.worker import NoActiveWorker, get_current_worker
 
 # Internal
+from .compact import compact
+from .dispatch import ToolDispatcher
 from .gitea import GiteaTools
+from .governor import governor, retry_after
+from .heatmap import Heatmap
+from .history import History
+from .logwriter import LogWriter
+from .router import ToolRouter
+from .status import StatusCounts
+from .trace import span, tracer
+from .utils import opt
+
+
+def _llm_transient(err):
+    """Governor classifier for OpenAI errors worth another try"""
+    if isinstance(
+        err,
+        (
+            openai.error.RateLimitError,
+            openai.error.ServiceUnavailableError,
+            openai.error.Timeout,
+            openai.error.APIConnectionError,
+            openai.error.TryAgain,
+        ),
+    ):
+        return retry_after(err.headers)
+    if isinstance(err, openai.error.APIError) and (err.http_status or 500) >= 500:
+        return retry_after(err.headers)
+    return None
+
+
+def _describe(breakdown) -> str:
+    """One line per kind of span from Tracer.breakdown(), slowest calls last"""
+    lines = []
+    for kind, n in breakdown.items():
+        if kind == "slowest":
+            continue
+        extra = [f"{n['bytes'] / 1024:.1f}KB"] if "bytes" in n else []
+        if "prompt_tokens" in n:
+            extra.append(f"{n['prompt_tokens']}→{n['completion_tokens']} tokens")
+        if n.get("errors", 0):
+            extra.append(f"{n['errors']} errors")
+        lines.append(
+            f"{kind:<7}{n['calls']:>4} calls {n['seconds']:>7.2f}s  " + "  ".join(extra)
+        )
+    if breakdown.get("slowest", None):
+        lines.append("slowest: " + " · ".join(breakdown["slowest"]))
+    return "\n".join(lines)
+
+
+class Turn:
+    """What one prompt's run keeps while it works: its span, tool selection,
+    stats and deadline
+
+    Passed down the turn's calls rather than kept on the app, so a cancelled
+    turn still winding down can't write into the next one."""
+
+    def __init__(self, prompt, span, selection, seconds):
+        self.prompt = prompt
+        self.span = span
+        self.selection = selection
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds
+        self.stats = {
+            "round_trips": 0,
+            "tool_calls": 0,
+            "llm": 0.0,
+            "tools": 0.0,
+            "render": 0.0,
+        }
 
 
 class Geris(App):
 
     theme = "catppuccin-mocha"
-    BINDINGS = [("ctrl+q", "quit", "Quit")]
+    BINDINGS = [
+        ("ctrl+q", "quit", "Quit"),
+        ("escape", "cancel_chat", "Cancel"),
+        ("ctrl+n", "new_chat", "New conversation"),
+    ]
     CSS = """
     VerticalScroll       { background: #282a36; color: #f8f8f2; height: 3fr; background: $surface; }
     VerticalScroll:focus { background: #282a36; color: #f8f8f2; height: 3fr; background: $surface; }
@@ -48,11 +124,53 @@ class Geris(App):
     #spark > .sparkline--min-color { color: $accent 30%; }
     """
 
-    def setup_app(self, host, token, model, debug=False) -> None:
-        self._tools = GiteaTools(host, token)
+    def setup_app(
+        self,
+        host,
+        token,
+        model,
+        debug=False,
+        gitea_cfg=None,
+        openai_cfg=None,
+        startup=None,
+        session=None,
+    ) -> None:
+        if opt(gitea_cfg, "backend", "sync") == "async":
+            # aiohttp is an optional dependency, only needed for this backend
+            from .aio import AsyncGiteaTools
+
+            self._tools = AsyncGiteaTools(host, token, gitea_cfg)
+        else:
+            self._tools = GiteaTools(host, token, gitea_cfg)
+        self._status = StatusCounts(self._tools)
+        self._heatmap = Heatmap(
+            self._tools,
+            opt(gitea_cfg, "heatmap_cache", "~/.cache/geris/heatmap.json"),
+            host,
+        )
+        self._dispatch = ToolDispatcher(self._tools, opt(openai_cfg, "tool_workers", 4))
+        self._router = ToolRouter(self._tools, opt(openai_cfg, "max_tools", 12))
+        self._llmGov = governor(
+            opt(openai_cfg, "uri", "openai"), openai_cfg, _llm_transient
+        )
+        self._history = None
+        self._giteaCfg = gitea_cfg
+        self._openaiCfg = openai_cfg
         self._llm_model = model
         self._debugFlag = debug
         self._reqCount = 0
+        self._log = LogWriter(
+            opt(openai_cfg, "log_max_bytes", 10 * 1024 * 1024),
+            opt(openai_cfg, "log_backups", 3),
+        )
+        # the last turn that finished, for the session recording and benchmarks
+        self._lastTurn = None
+        self._startup = startup
+        self._session = session
+        self._create = openai.ChatCompletion.create
+        if session is not None:
+            session.attach(self._tools)
+            self._create = session.chat(self._create)
 
     def compose(self) -> ComposeResult:
         self._mdown = Static()
@@ -85,41 +203,91 @@ class Geris(App):
         yield self._input
         yield Footer()
 
-    def update_status(self) -> None:
+    @work(thread=True, group="status", exit_on_error=False)
+    def update_status(self, full=False) -> None:
+        totals = self._status.refresh(full)
+        for err in self._status.errors:
+            self._debug(f"{time.strftime('%H:%M:%S')} :: Status: {err}")
+        self._ui(self._show_status, totals)
+
+    @work(thread=True, group="store", exit_on_error=False)
+    def sync_store(self) -> None:
+        result = self._tools.sync_store()
+        self._debug(f"{time.strftime('%H:%M:%S')} :: Store: {result}")
+
+    @work(thread=True, group="prewarm", exit_on_error=False)
+    def prewarm(self, count) -> None:
+        mark = time.monotonic()
+        warm = self._tools.prewarm(count)
+        self._debug(
+            f"{time.strftime('%H:%M:%S')} :: Prewarmed {warm}/{count} connections "
+            f"in {time.monotonic() - mark:.2f}s"
+        )
+
+    def _show_status(self, totals) -> None:
         issues_w = self.query_one("#status-issues", Static)
         milestones_w = self.query_one("#status-milestones", Static)
         prs_w = self.query_one("#status-prs", Static)
-        data = self._tools.dashboard()
-        issues_w.update(f"[green]Open Issues[/green]: {len(data['issues'])}")
-        milestones_w.update(
-            f"[yellow]Open Milestones[/yellow]: {len(data['milestones'])}"
-        )
-        prs_w.update(f"[cyan]Open PRs[/cyan]: {len(data['prs'])}")
+        issues_w.update(f"[green]Open Issues[/green]: {totals['issues']}")
+        milestones_w.update(f"[yellow]Open Milestones[/yellow]: {totals['milestones']}")
+        prs_w.update(f"[cyan]Open PRs[/cyan]: {totals['prs']}")
 
-    def set_heatmap_data(self, year: int) -> None:
-        """Sets the data based on the current data."""
-        datums = [
-            n["contributions"]
-            for n in self._tools.get_heatmap_data(self._tools.default_user())
-        ]
+    @work(thread=True, group="heatmap", exit_on_error=False)
+    def refresh_heatmap(self) -> None:
+        days = self._heatmap.refresh()
+        self._debug(f"{time.strftime('%H:%M:%S')} :: Heatmap: {days} days updated")
+        self._ui(self.set_heatmap_data)
 
-        for _ in range(365 - len(datums)):
-            datums.insert(0, 0)
-
-        self.query_one(Sparkline).data = datums
+    def set_heatmap_data(self, year: int = None) -> None:
+        """Show the known contributions of year, or of the last 365 days"""
+        self.query_one(Sparkline).data = self._heatmap.series(year)
 
     def on_mount(self) -> None:
         self.title = "Geris - Gitea Issue Management....hopefully"
-        self.set_heatmap_data(2025)
+        # last launch's counts show at once, fresh ones follow when fetched
+        if self._heatmap.load():
+            self.set_heatmap_data()
+        self.refresh_heatmap()
         self.query_one("#input", Input).focus()
-        self.update_status()
+        if opt(self._giteaCfg, "prewarm", 0) > 0:
+            self.prewarm(opt(self._giteaCfg, "prewarm", 0))
+        self.update_status(True)
+        self.set_interval(
+            opt(self._giteaCfg, "status_interval", 300.0),
+            lambda: self.update_status(True),
+        )
+        self.set_interval(
+            opt(self._giteaCfg, "status_interval", 300.0), self.refresh_heatmap
+        )
+        if self._tools.enabled("sync_store"):
+            self.sync_store()
+            self.set_interval(
+                opt(self._giteaCfg, "store_interval", 600.0), self.sync_store
+            )
+        if self._startup is not None:
+            self._startup.append(("mount and heatmap", time.perf_counter()))
+            self.call_after_refresh(self._startup_done)
+        if self._session is not None and self._session.replaying:
+            self._replay_next()
+
+    def _startup_done(self) -> None:
+        self._startup.append(("first frame", time.perf_counter()))
+        self.exit()
+
+    def _replay_next(self) -> None:
+        """Submit the next recorded prompt, or exit once every one has run"""
+        prompts = self._session.prompts()
+        if len(self._session.replayed) < len(prompts):
+            prompt = prompts[len(self._session.replayed)]
+            self.show_output(Input.Submitted(self._input, prompt))
+        else:
+            self.exit()
 
     @on(Input.Submitted)
     def show_output(self, event: Input.Submitted) -> None:
-        self._messages = [
-            {
-                "role": "system",
-                "content": os.getenv(
+        if self._history is None:
+            self._history = History(
+                os.getenv(
                     "OPENAI_DEFAULT_PROMPT",
                     """You are a task automation assistant specialized in project repository management. Your primary directives are:
 1. Any personal possessive references to 'me' or 'my' by the user will be assumed to mean the 'deafault user'
@@ -132,112 +300,449 @@ class Geris(App):
 8. Tool Calls. Use tools only when necessary, and always prefer to use the `default_user` tool for any user-specific actions.
 9. Use of unicode symbols or emojis is allowed, but should be used sparingly and only when it adds value to the response.""",
                 ),
-            },
-        ]
-        self._messages.append({"role": "user", "content": event.value})
-        self._prompt = event.value
+                self._llm_model,
+                opt(self._openaiCfg, "context_budget", 16000),
+                opt(self._openaiCfg, "keep_turns", 2),
+            )
+        self._messages = self._history.start_turn(event.value)
         self._chat_flag = False
-        self._process_chat()
+        self._input.clear()
+        self._body.loading = True
+        self._chat(self._messages, event.value)
+
+    @work(thread=True, exclusive=True, group="chat")
+    def _chat(self, messages, prompt) -> None:
+        turn = self._process_chat(messages, prompt)
+        self._ui(self._chat_done, messages, turn)
+
+    def _chat_done(self, messages, turn) -> None:
+        self._lastTurn = turn
+        self._body.loading = False
+        self._history.commit(messages)
+        self._debug(
+            f"{time.strftime('%H:%M:%S')} :: History: {len(messages)} messages, "
+            f"~{self._history.tokens()} tokens"
+        )
+        self._debug(
+            f"{time.strftime('%H:%M:%S')} :: Cache: {self._tools.cache_stats()}"
+        )
+        self._debug(
+            f"{time.strftime('%H:%M:%S')} :: Governor: "
+            f"gitea {self._tools.governor_stats()} openai {self._llmGov.stats()}"
+        )
+        self._debug(f"{time.strftime('%H:%M:%S')} :: Pool: {self._tools.pool_stats()}")
+        self._debug(f"{time.strftime('%H:%M:%S')} :: Log: {self._log.stats()}")
+        tracer.flush()
+        if self._session is not None:
+            self._session.turn(
+                turn.prompt,
+                turn.stats,
+                tracer.breakdown(turn.span.id),
+                turn.span.duration,
+            )
         self.update_status()
+        if self._session is not None and self._session.replaying:
+            self._replay_next()
+
+    def action_cancel_chat(self) -> None:
+        if self.workers.cancel_group(self, "chat"):
+            self._body.loading = False
+            self._debug(f"{time.strftime('%H:%M:%S')} :: Cancelled")
+
+    def action_new_chat(self) -> None:
+        self.action_cancel_chat()
+        if self._history is not None:
+            self._history.reset()
+        self._mdown.update("")
+        self.sub_title = ""
+
+    def _cancelled(self) -> bool:
+        try:
+            return get_current_worker().is_cancelled
+        except NoActiveWorker:
+            return False
+
+    def _ui(self, fn, *args) -> None:
+        """Run fn on the event loop, dropping it if the calling worker is cancelled"""
+        if threading.current_thread() is threading.main_thread():
+            fn(*args)
+            return
+        try:
+            worker = get_current_worker()
+        except NoActiveWorker:
+            worker = None
+        self.call_from_thread(
+            lambda: None if worker and worker.is_cancelled else fn(*args)
+        )
 
     def _debug(self, msg, pretty=False) -> None:
         if self._debugFlag:
-            if pretty:
-                self.query_one(RichLog).write(Panel(Pretty(msg)))
+            self._ui(
+                self.query_one(RichLog).write, Panel(Pretty(msg)) if pretty else msg
+            )
+            self._log.write("_process_chat.debug", str(msg) + "\n")
+
+    def _log_requests(self, messages) -> None:
+        """Append the request about to be sent to req.debug.jsonl
+
+        Each message is written under a digest of its content, once per log
+        file, and the request is a line listing the digests it sends in
+        order. History that was shortened or dropped just changes the list,
+        and after a rotation the messages are written again, so every
+        request can be rebuilt from the file it is in."""
+        keys, once = [], []
+        for msg in messages:
+            text = json.dumps(msg, default=str, sort_keys=True)
+            key = hashlib.sha256(text.encode()).hexdigest()[:16]
+            keys.append(key)
+            once.append((key, f'{{"digest": "{key}", "message": {text}}}\n'))
+        self._log.write(
+            "req.debug.jsonl",
+            json.dumps({"request": self._reqCount, "messages": keys}) + "\n",
+            once,
+        )
+
+    def _run_tool(self, turn, call) -> dict:
+        fn = call["function"]["name"]
+        args = call["function"]["arguments"]
+        if self._cancelled():
+            # the turn was cancelled while this call waited for a worker
+            return {
+                "role": "tool",
+                "tool_call_id": call["id"],
+                "content": json.dumps({"error": "Cancelled"}),
+            }
+
+        self._debug(f"{time.strftime('%H:%M:%S')} :: Tool: {fn} - Args: {args}")
+
+        with span("tool", fn) as s:
+            try:
+                params = json.loads(args or "{}")
+                if fn == "request_tools":
+                    result = turn.selection.request(params.get("need", None))
+                    self._debug(result, True)
+                    return {
+                        "role": "tool",
+                        "tool_call_id": call["id"],
+                        "content": json.dumps(result),
+                    }
+                turn.selection.used(fn)
+                result = self._tools.call(fn, params)
+                self._debug(result, True)
+                if self._tools.mutates(fn):
+                    self._status.invalidate(params.get("owner"), params.get("repo"))
+            except ValueError as e:
+                # bad JSON or arguments that don't match the schema never reach gitea
+                result = {"error": f"Invalid arguments for tool {fn}: {str(e)}"}
+                self._debug(result, True)
+                s.set(error=result["error"][:200])
+            except Exception as e:
+                result = {"error": f"Tool {fn} raised an error: {str(e)}"}
+                self._debug(result, True)
+                s.set(error=result["error"][:200])
+
+            result = compact(
+                fn,
+                result,
+                opt(self._openaiCfg, "max_items", 50),
+                opt(self._openaiCfg, "max_text", 2000),
+            )
+            content = json.dumps(result, default=str)
+            s.set(bytes=len(content))
+        return {
+            "role": "tool",
+            "tool_call_id": call["id"],
+            "content": content,
+        }
+
+    def _render(self, turn, content) -> None:
+        mark = time.monotonic()
+        with span("render", bytes=len(content)):
+            self._ui(
+                self._mdown.update,
+                Markdown(
+                    "\n".join(
+                        (
+                            "# Prompt",
+                            f"- `Input`: **{turn.prompt}**",
+                            "# Response",
+                            content,
+                        )
+                    )
+                ),
+            )
+        turn.stats["render"] += time.monotonic() - mark
+
+    def _stream_completion(self, turn, messages, batch, tools, s) -> dict:
+        """Assemble a streamed assistant message, rendering content as it arrives
+
+        Tool calls stream one after another, so each read-only call is handed
+        to the dispatcher as soon as the next one starts. A call that changes
+        data, and every call after it, is held until the stream ends: if the
+        stream breaks off the turn fails, and retrying the prompt would
+        repeat a write that already went out."""
+        interval = opt(self._openaiCfg, "render_interval", 0.25)
+        content, calls, held = [], {}, []
+        rendered = time.monotonic()
+
+        def start(call):
+            # later calls wait behind a held one so the dispatcher still
+            # sees them in the order the model asked for them
+            if held or self._tools.mutates(call["function"]["name"]):
+                held.append(call)
             else:
-                self.query_one(RichLog).write(msg)
-            with open("_process_chat.debug", "a+") as fp:
-                fp.write(str(msg) + "\n")
+                self._submit(turn, batch, call)
 
-    def _process_chat(self) -> None:
-        self._reqCount += 1
-        try:
-            # Always make the API call with current messages
-            response = openai.ChatCompletion.create(
+        # errors surface from create() before the first chunk, so only
+        # opening the stream is retried, never a half-consumed one
+        stream = self._llmGov.call(
+            lambda: self._create(
                 model=self._llm_model,
-                messages=self._messages,
-                tools=self._tools.tools(),
+                messages=messages,
+                tools=tools,
                 tool_choice="auto",
+                stream=True,
+                request_timeout=self._remaining(turn),
             )
+        )
+        for chunk in stream:
+            # None tells the loop to stop: cancelled, or out of time
+            if self._cancelled() or time.monotonic() >= turn.deadline:
+                return None
+            if "first_chunk" not in s.attrs:
+                s.set(first_chunk=round(time.time() - s.start, 3))
+            if not chunk["choices"]:
+                continue
+            delta = chunk["choices"][0].get("delta", {})
+            if delta.get("content", None):
+                content.append(delta["content"])
+                # re-parsing the whole document per token is what makes long
+                # answers slow, so only repaint every render_interval seconds
+                if time.monotonic() - rendered >= interval:
+                    self._render(turn, "".join(content))
+                    rendered = time.monotonic()
+            for tc in delta.get("tool_calls", None) or []:
+                idx = tc.get("index", 0)
+                if idx not in calls:
+                    if calls:
+                        start(calls[max(calls)])
+                    calls[idx] = {
+                        "id": None,
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""},
+                    }
+                if tc.get("id", None):
+                    calls[idx]["id"] = tc["id"]
+                fn = tc.get("function", None) or {}
+                calls[idx]["function"]["name"] += fn.get("name", None) or ""
+                calls[idx]["function"]["arguments"] += fn.get("arguments", None) or ""
+        if calls:
+            start(calls[max(calls)])
+        for call in held:
+            self._submit(turn, batch, call)
 
-            # Debug output
-            if self._debugFlag:
-                with open(f"choices-{self._reqCount:05d}.debug", "w+") as fp:
-                    fp.write(json.dumps(response["choices"], indent=2))
-
-            message = response["choices"][0]["message"]
+        message = {"role": "assistant", "content": "".join(content) or None}
+        if calls:
+            message["tool_calls"] = [calls[i] for i in sorted(calls)]
+        return message
 
-            if "tool_calls" in message:
-                # Add the assistant's tool-call message to history ONCE
-                if not any(
-                    msg.get("tool_calls") == message["tool_calls"]
-                    for msg in self._messages
-                ):
-                    self._messages.append(
-                        {k: v for k, v in message.items() if k != "reasoning_content"}
+    def _completion(self, turn, messages, batch) -> dict:
+        tools = turn.selection.schemas()
+        stream = opt(self._openaiCfg, "stream", True)
+        with span("llm", self._llm_model, stream=stream, messages=len(messages)) as s:
+            s.set(tools=len(tools))
+            usage = {}
+            if stream:
+                message = self._stream_completion(turn, messages, batch, tools, s)
+            else:
+                response = self._llmGov.call(
+                    lambda: self._create(
+                        model=self._llm_model,
+                        messages=messages,
+                        tools=tools,
+                        tool_choice="auto",
+                        request_timeout=self._remaining(turn),
                     )
+                )
+                usage = response.get("usage", None) or {}
+                message = response["choices"][0]["message"]
+                for call in message.get("tool_calls", None) or []:
+                    self._submit(turn, batch, call)
+            # streamed replies carry no usage, so count them ourselves
+            s.set(
+                prompt_tokens=usage.get("prompt_tokens", None)
+                or self._history.tokens(messages),
+                completion_tokens=usage.get("completion_tokens", None)
+                or (self._history.tokens([message]) if message else 0),
+                counted="usage" if usage else "estimate",
+            )
+        return message
 
-                # Process ALL tool calls first
-                tool_responses = []
-                for call in message["tool_calls"]:
-                    fn = call["function"]["name"]
-                    args = call["function"]["arguments"]
+    def _remaining(self, turn) -> float:
+        """Seconds a model request may take before the turn runs out of time"""
+        return max(turn.deadline - time.monotonic(), 1.0)
 
-                    self._debug(
-                        f"{time.strftime('%H:%M:%S')} :: Tool: {fn} - Args: {args}"
-                    )
+    def _submit(self, turn, batch, call) -> None:
+        """Start call, or answer it with an error once the turn is out of budget
 
-                    try:
-                        result = eval(f"self._tools.{fn}(**{args})")
-                        self._debug(result, True)
-                    except Exception as e:
-                        result = {"error": f"Tool {fn} raised an error: {str(e)}"}
-                        self._debug(result, True)
-
-                    tool_responses.append(
-                        {
-                            "role": "tool",
-                            "tool_call_id": call["id"],
-                            "content": json.dumps(result, default=str),
-                        }
-                    )
+        Checked per call, so a reply asking for more calls than are left
+        only runs as many as the budget allows."""
+        if turn.stats["tool_calls"] >= opt(self._openaiCfg, "max_tool_calls", 50):
+            reason = f"{turn.stats['tool_calls']} tool calls"
+        elif time.monotonic() >= turn.deadline:
+            reason = f"{time.monotonic() - turn.started:.0f} seconds"
+        else:
+            turn.stats["tool_calls"] += 1
+            batch.submit(call)
+            return
+        self._debug(
+            f"{time.strftime('%H:%M:%S')} :: Not run: {call['function']['name']}"
+        )
+        batch.answer(
+            call,
+            {
+                "role": "tool",
+                "tool_call_id": call["id"],
+                "content": json.dumps(
+                    {"error": f"Not run: this prompt is limited to {reason}"}
+                ),
+            },
+        )
+
+    def _stop(self, turn, reason) -> None:
+        self._render(
+            turn,
+            f"**Stopped after {reason}** before the assistant finished. "
+            "Try a narrower request, or raise the limits in the "
+            "openai profile.",
+        )
+
+    def _limit_reached(self, turn):
+        stats, started = turn.stats, turn.started
+        if stats["round_trips"] >= opt(self._openaiCfg, "max_iterations", 10):
+            return f"{stats['round_trips']} model round trips"
+        if stats["tool_calls"] >= opt(self._openaiCfg, "max_tool_calls", 50):
+            return f"{stats['tool_calls']} tool calls"
+        if time.monotonic() - started >= opt(self._openaiCfg, "max_seconds", 180.0):
+            return f"{time.monotonic() - started:.0f} seconds"
+        return None
 
-                # Add ALL tool responses at once
-                self._messages.extend(tool_responses)
+    def _summarize_turn(self, turn) -> None:
+        stats, started = turn.stats, turn.started
+        summary = (
+            f"{stats['round_trips']} round trips · {stats['tool_calls']} tool calls · "
+            f"llm {stats['llm']:.1f}s · tools {stats['tools']:.1f}s · "
+            f"render {stats['render']:.1f}s · {time.monotonic() - started:.1f}s total"
+        )
+        self._debug(f"{time.strftime('%H:%M:%S')} :: Turn: {summary}")
+        if self._debugFlag:
+            self._debug(
+                f"{time.strftime('%H:%M:%S')} :: Latency:\n"
+                + _describe(tracer.breakdown(turn.span.id))
+            )
+        self._ui(setattr, self, "sub_title", summary)
+
+    def _process_chat(self, messages, prompt) -> Turn:
+        with span("turn", prompt=prompt[:200]) as s:
+            turn = Turn(
+                prompt,
+                s,
+                self._router.select(prompt),
+                opt(self._openaiCfg, "max_seconds", 180.0),
+            )
+            self._turn_loop(turn, messages)
+        return turn
+
+    def _turn_loop(self, turn, messages) -> None:
+        stats = turn.stats
+        batch = None
+        try:
+            while True:
+                self._reqCount += 1
+                stats["round_trips"] += 1
 
-                # Debug and recurse
+                # Always make the API call with current messages, offering
+                # only the tools routed to this prompt so far
+                batch = self._dispatch.batch(lambda call: self._run_tool(turn, call))
+                self._debug(
+                    f"{time.strftime('%H:%M:%S')} :: Offering "
+                    f"{len(turn.selection.schemas())} tools"
+                )
                 if self._debugFlag:
-                    with open(f"req-{self._reqCount:05d}.json", "w+") as fp:
-                        fp.write(json.dumps(self._messages, indent=2))
+                    self._log_requests(messages)
+                mark = time.monotonic()
+                message = self._completion(turn, messages, batch)
+                stats["llm"] += time.monotonic() - mark
+                if self._cancelled():
+                    batch.cancel()
+                    return
+                if message is None:
+                    batch.cancel()
+                    self._stop(turn, f"{time.monotonic() - turn.started:.0f} seconds")
+                    break
 
-                self._process_chat()
-            else:
-                # Final response handling
+                # Debug output
                 if self._debugFlag:
-                    with open(f"req-{self._reqCount:05d}.json", "w+") as fp:
-                        fp.write(json.dumps(self._messages, indent=2))
-
-                self._mdown.update(
-                    Markdown(
-                        "\n".join(
-                            (
-                                "# Prompt",
-                                f"- `Input`: **{self._prompt}**",
-                                "# Response",
-                                message["content"],
-                            )
+                    self._log.write(
+                        "choices.debug.jsonl",
+                        json.dumps(
+                            {"request": self._reqCount, "message": message},
+                            default=str,
                         )
+                        + "\n",
+                    )
+
+                if not message.get("tool_calls", None):
+                    # Final response handling, kept so follow-ups can refer to it
+                    messages.append(
+                        {"role": "assistant", "content": message["content"] or ""}
+                    )
+
+                    self._render(turn, message["content"] or "")
+                    break
+
+                # Add the assistant's tool-call message to history ONCE
+                if not any(
+                    msg.get("tool_calls") == message["tool_calls"] for msg in messages
+                ):
+                    messages.append(
+                        {k: v for k, v in message.items() if k != "reasoning_content"}
                     )
+
+                # Collect ALL tool calls, independent ones ran concurrently
+                mark = time.monotonic()
+                tool_responses = batch.results(
+                    lambda: self._cancelled() or time.monotonic() >= turn.deadline
                 )
+                stats["tools"] += time.monotonic() - mark
+                if self._cancelled():
+                    return
+                if tool_responses is None:
+                    self._stop(turn, f"{time.monotonic() - turn.started:.0f} seconds")
+                    break
+
+                # Add ALL tool responses at once, in tool_call_id order
+                messages.extend(tool_responses)
+
+                # Stop runaway tool chains before they run up latency and spend
+                reason = self._limit_reached(turn)
+                if reason is not None:
+                    self._stop(turn, reason)
+                    break
+
+            self._summarize_turn(turn)
         except Exception as e:
+            # the turn failed, so don't run tool calls it had already started
+            if batch is not None:
+                batch.cancel()
             data = [
                 "# `ERROR`: **Failed to get assistant response**",
                 f"- `Message`: **{str(e)}**",
-                f"- `Request Debug File`: **req-{self._reqCount:05d}.json**",
-                f"- `Choices Debug File`: **choices-{self._reqCount:05d}.json**",
+                f"- `Request Debug File`: **req.debug.jsonl**, request {self._reqCount}",
+                f"- `Choices Debug File`: **choices.debug.jsonl**, request {self._reqCount}",
                 "# Message Stack",
             ]
-            for n in self._messages:
+            for n in messages:
                 data.append("---")
                 data.append(f"- `Role`: **{n.get('role', None)}**")
                 data.append(f"  - `Content`: {n.get('content', '')}")
@@ -250,16 +755,15 @@ class Geris(App):
                     data.append(f"    - `Type`: **{d.get('type', None)}**")
                     data.append(f"    - `Function`: **{d.get('function', None)}**")
             # [data.append("- " + str(n)) for n in self._messages]
-            self._mdown.update(Markdown("\n".join(data)))
-            with open("error._process_chat.debug", "a+") as fp:
-                for msg in self._messages:
-                    fp.write(f"{json.dumps(msg, indent=2)}\n")
-                    fp.write(("-" * 80) + "\n" + str(e) + "\n")
-                    tb = traceback.extract_tb(sys.exc_info()[2])
-                    for frame in tb:
-                        fp.write(
-                            f"File {frame.filename}, line {frame.lineno}, in {frame.name}\n"
-                        )
-                    fp.write(f"{type(e).__name__}: {e}")
-
-        self._input.clear()
+            self._ui(self._mdown.update, Markdown("\n".join(data)))
+            out = []
+            for msg in messages:
+                out.append(f"{json.dumps(msg, indent=2, default=str)}\n")
+                out.append(("-" * 80) + "\n" + str(e) + "\n")
+                tb = traceback.extract_tb(sys.exc_info()[2])
+                for frame in tb:
+                    out.append(
+                        f"File {frame.filename}, line {frame.lineno}, in {frame.name}\n"
+                    )
+                out.append(f"{type(e).__name__}: {e}")
+            self._log.write("error._process_chat.debug", "".join(out))
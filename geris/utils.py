@@ -1,11 +1,48 @@
+import hashlib
 import json
 import inspect
+import itertools
+import os
 from typing import get_args, get_origin
 
+from .trace import submit
 
-def tool(fn):
-    fn._is_tool = True
-    return fn
+
+class ToolArgumentError(ValueError):
+    pass
+
+
+def tool(fn=None, *, mutates=False, requires=None, ttl=None):
+    def wrap(fn):
+        fn._is_tool = True
+        fn._mutates = mutates
+        fn._requires = requires
+        fn._ttl = ttl
+        return fn
+
+    return wrap if fn is None else wrap(fn)
+
+
+def opt(section, key, default):
+    """Read key from a config section (or dict), cast to the type of default"""
+    val = None if section is None else section.get(key, None)
+    if val is None or default is None:
+        return default if val is None else val
+    if isinstance(default, bool):
+        return str(val).strip().lower() in ("1", "yes", "true", "on")
+    return type(default)(val)
+
+
+def fanout(fn, items, pool):
+    """Run fn over items on pool, returning (result, error) pairs in input order"""
+    futures = [submit(pool, fn, item) for item in items]
+    retv = []
+    for fut in futures:
+        try:
+            retv.append((fut.result(), None))
+        except Exception as e:
+            retv.append((None, e))
+    return retv
 
 
 def func2tool(p):
@@ -16,7 +53,7 @@ def func2tool(p):
         },
     }
     data = [
-        [tuple(tkn.split(":")) for tkn in ln.split("; ")]
+        [tuple(tkn.strip().split(":", 1)) for tkn in ln.split(";") if tkn.strip()]
         for ln in p.__doc__.split("\n")
     ]
     sig = inspect.signature(p)
@@ -31,6 +68,8 @@ def func2tool(p):
             return {"type": "number"}
         elif n is bool or n == "bool":
             return {"type": "boolean"}
+        elif n is dict or n == "dict":
+            return {"type": "object"}
         elif get_origin(n) is list:
             _retv = {"type": "array", "items": typeof(get_args(n)[0])}
             return _retv
@@ -45,6 +84,8 @@ def func2tool(p):
 
     # now parse the docstring to fill in extra details
     for datum in data:
+        if not datum:
+            continue
         key = datum[0][0]
         keys = retv["function"]["parameters"]["properties"].keys()
         for item in datum:
@@ -64,3 +105,145 @@ def func2tool(p):
                 retv["function"]["parameters"]["properties"][key][item[0]] = item[1]
 
     return retv
+
+
+def source_hash(*objs) -> str:
+    """Digest of the source files defining objs, to key caches derived from them"""
+    digest = hashlib.sha256()
+    for path in sorted({inspect.getsourcefile(n) for n in objs}):
+        with open(path, "rb") as fp:
+            digest.update(fp.read())
+    return digest.hexdigest()
+
+
+def _read_schemas(path) -> dict:
+    try:
+        with open(path) as fp:
+            data = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+    # one entry per source key, so backends with different sources don't evict each other
+    return (data.get("keys", None) or {}) if isinstance(data, dict) else {}
+
+
+def load_schemas(path, key) -> dict:
+    """Tool name -> cached schema and tags, or {} when the cache is missing or stale"""
+    return _read_schemas(path).get(key, None) or {}
+
+
+def save_schemas(path, key, tools, keep=4) -> None:
+    """Write the schema cache atomically; a read-only cache dir just means no cache
+
+    The keep most recently saved keys are kept, older sources are dropped."""
+    data = {k: v for k, v in _read_schemas(path).items() if k != key}
+    data[key] = tools
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.{os.getpid()}", "w") as fp:
+            json.dump({"keys": dict(list(data.items())[-keep:])}, fp)
+        os.replace(f"{path}.{os.getpid()}", path)
+    except OSError:
+        pass
+
+
+def doc_tags(p) -> set:
+    """Category tags from the tags: line of a tool docstring"""
+    for ln in (p.__doc__ or "").split("\n"):
+        key, _, val = ln.strip().partition(":")
+        if key == "tags":
+            return {tkn.strip() for tkn in val.split(",") if tkn.strip()}
+    return set()
+
+
+def paginate(fetch, page_size=50, limit=None, pool=None):
+    """Yield items from fetch(page, size) -> (items, total or None) page by page
+
+    Once the first page reports the total, every remaining page is
+    requested on pool at once and yielded in order. Without a total the
+    next page is requested while one is being consumed."""
+    size = min(page_size, limit) if limit else page_size
+    items, total = fetch(1, size)
+    if items and len(items) < size and (total is None or total > len(items)):
+        # the server caps the page size below what was asked for (Gitea's
+        # MAX_RESPONSE_ITEMS), so plan and stop on what it actually returns
+        size = len(items)
+    if total is not None:
+        wanted = min(total, limit) if limit else total
+        pages = range(2, -(-wanted // size) + 1)
+        pending = [submit(pool, fetch, n, size) for n in pages] if pool else []
+        rest = (
+            (fut.result()[0] for fut in pending)
+            if pool
+            else (fetch(n, size)[0] for n in pages)
+        )
+        try:
+            # the listing may have grown since the total was counted
+            yield from itertools.islice(
+                itertools.chain(items, itertools.chain.from_iterable(rest)), wanted
+            )
+        finally:
+            for fut in pending:
+                fut.cancel()
+        return
+
+    page, count = 1, 0
+    while True:
+        last = len(items) < size
+        more = not limit or count + len(items) < limit
+        pending = (
+            submit(pool, fetch, page + 1, size) if pool and more and not last else None
+        )
+        for n in items:
+            if limit and count >= limit:
+                return
+            count += 1
+            yield n
+        if last or not more:
+            return
+        page += 1
+        items, _ = pending.result() if pending else fetch(page, size)
+
+
+def validator(schema):
+    """Precompile a check of call arguments against a func2tool schema"""
+    params = schema["function"]["parameters"]
+    props = params["properties"]
+    required = [k for k in params["required"] if k]
+
+    def typecheck(prop):
+        kind = prop.get("type", None)
+        if kind == "string":
+            return lambda v: isinstance(v, str)
+        elif kind == "integer":
+            return lambda v: isinstance(v, int) and not isinstance(v, bool)
+        elif kind == "number":
+            return lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)
+        elif kind == "boolean":
+            return lambda v: isinstance(v, bool)
+        elif kind == "object":
+            return lambda v: isinstance(v, dict)
+        elif kind == "array":
+            item = typecheck(prop.get("items", {}))
+            return lambda v: isinstance(v, list) and all(item(n) for n in v)
+        return lambda v: True
+
+    checks = {k: typecheck(v) for k, v in props.items()}
+    enums = {k: v["enum"] for k, v in props.items() if "enum" in v}
+
+    def validate(args):
+        if not isinstance(args, dict):
+            raise ToolArgumentError("arguments must be a JSON object")
+        errors = [f"missing required argument '{k}'" for k in required if k not in args]
+        for k, v in args.items():
+            if k not in checks:
+                errors.append(f"unexpected argument '{k}'")
+            elif v is None:
+                continue
+            elif not checks[k](v):
+                errors.append(f"argument '{k}' must be of type {props[k]['type']}")
+            elif k in enums and v not in enums[k]:
+                errors.append(f"argument '{k}' must be one of {','.join(enums[k])}")
+        if errors:
+            raise ToolArgumentError("; ".join(errors))
+
+    return validate
@@ -0,0 +1,47 @@
+import glob
+import json
+
+import pytest
+
+from geris.logwriter import LogWriter
+from geris.tui import Geris
+
+
+def requests(sent=12):
+    """The messages of each request in a conversation that keeps growing"""
+    messages = [{"role": "system", "content": "You manage repositories. " * 20}]
+    for n in range(sent):
+        messages = messages + [{"role": "user", "content": f"prompt {n} " * 30}]
+        yield messages
+        messages = messages + [{"role": "assistant", "content": f"answer {n}"}]
+        if len(messages) > 7:
+            # history trimmed: the oldest turn dropped, the system prompt kept
+            messages = messages[:1] + messages[3:]
+
+
+@pytest.mark.parametrize("max_bytes", [0, 2000, 5000])
+def test_every_request_rebuilds_from_its_file(tmp_path, monkeypatch, max_bytes):
+    monkeypatch.chdir(tmp_path)
+    app = Geris()
+    app._log = LogWriter(max_bytes, backups=100)
+    app._reqCount = 0
+    sent = []
+    for messages in requests():
+        app._reqCount += 1
+        app._log_requests(messages)
+        sent.append(messages)
+    app._log.close()
+
+    files = glob.glob("req.debug.jsonl*")
+    assert (len(files) > 1) == bool(max_bytes)
+    rebuilt = {}
+    for path in files:
+        digests = {}
+        for line in open(path):
+            entry = json.loads(line)
+            if "digest" in entry:
+                digests[entry["digest"]] = entry["message"]
+            else:
+                # only digests written to this same file, earlier
+                rebuilt[entry["request"]] = [digests[k] for k in entry["messages"]]
+    assert [rebuilt[n + 1] for n in range(len(sent))] == sent
@@ -0,0 +1,43 @@
+import configparser
+
+import pytest
+
+from bench.fake_gitea import FakeGitea
+from geris.gitea import GiteaTools
+
+
+@pytest.fixture(params=[True, False], ids=["total", "no-total"])
+def gitea(request):
+    # 230 issues in repo0; pages are capped at 50 whatever limit asks for
+    fake = FakeGitea(repos=1, issues=230, prs=0, total_count=request.param)
+    yield fake.start()
+    fake.stop()
+
+
+def backends():
+    yield GiteaTools
+    try:
+        from geris.aio import AsyncGiteaTools
+    except ImportError:
+        return
+    yield AsyncGiteaTools
+
+
+@pytest.mark.parametrize("backend", list(backends()), ids=lambda n: n.__name__)
+@pytest.mark.parametrize("limit", [None, 120])
+def test_capped_pages(gitea, backend, limit):
+    config = configparser.ConfigParser()
+    config["gitea"] = {"page_size": "100", "schema_cache": "", "cache_size": "0"}
+    tools = backend(gitea, "token", config["gitea"])
+    spec = (
+        "/repos/{owner}/{repo}/issues",
+        {"owner": "bench", "repo": "repo0"},
+        {"state": "all", "type": "issues"},
+    )
+    wanted = list(range(1, 231))[:limit]
+    items = list(tools._pages(spec[0], spec[1], limit=limit, **spec[2]))
+    assert [n["number"] for n in items] == wanted
+    # the fan-outs page on their own path in the async backend
+    [(items, err)] = tools._listings([(spec[0], spec[1], dict(spec[2], limit=limit))])
+    assert err is None
+    assert [n["number"] for n in items] == wanted
@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from geris.utils import paginate
+
+ITEMS = list(range(230))
+
+
+def server(cap=None, total=True):
+    """fetch() over ITEMS that clamps the page size to cap, like Gitea does"""
+
+    def fetch(page, size):
+        size = min(size, cap) if cap else size
+        return ITEMS[(page - 1) * size : page * size], len(ITEMS) if total else None
+
+    return fetch
+
+
+@pytest.mark.parametrize("total", [True, False])
+@pytest.mark.parametrize("pool", [None, ThreadPoolExecutor(4)])
+@pytest.mark.parametrize("cap", [None, 50, 7])
+@pytest.mark.parametrize("limit", [None, 1, 50, 120, 229, 230, 500])
+def test_every_item_once(total, pool, cap, limit):
+    got = list(paginate(server(cap, total), 100, limit, pool))
+    assert got == ITEMS[:limit]
+
+
+def test_stop_early():
+    pages = paginate(server(50), 100, None, ThreadPoolExecutor(2))
+    assert next(pages) == 0
+    pages.close()
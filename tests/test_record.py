@@ -0,0 +1,54 @@
+import configparser
+import os
+
+import pytest
+
+from bench.fake_gitea import FakeGitea
+from geris.gitea import GiteaTools
+from geris.record import Session
+
+
+def backends():
+    yield GiteaTools
+    try:
+        from geris.aio import AsyncGiteaTools
+    except ImportError:
+        return
+    yield AsyncGiteaTools
+
+
+def calls(tools):
+    return [
+        tools.default_user(),
+        tools.list_repos("bench"),
+        tools.get_issue("bench", "repo0", 1),
+        tools.dashboard(),
+    ]
+
+
+@pytest.mark.parametrize("backend", list(backends()), ids=lambda n: n.__name__)
+def test_replay_with_another_token(tmp_path, backend):
+    config = configparser.ConfigParser()
+    config["gitea"] = {"schema_cache": "", "cache_size": "0", "etag_cache": "0"}
+    fake = FakeGitea(repos=10, issues=5)
+    uri = fake.start()
+    try:
+        session = Session(str(tmp_path))
+        tools = backend(uri, "token-used-to-record", config["gitea"])
+        session.attach(tools)
+        recorded = calls(tools)
+        session.close()
+    finally:
+        fake.stop()
+
+    session = Session(str(tmp_path), replay=True)
+    tools = backend(uri, "another-token", config["gitea"])
+    session.attach(tools)
+    assert calls(tools) == recorded
+    assert session.misses == 0
+
+    # and the token itself is nowhere in the recording
+    for root, _, files in os.walk(tmp_path):
+        for name in files:
+            with open(os.path.join(root, name), "rb") as fp:
+                assert b"token-used-to-record" not in fp.read()
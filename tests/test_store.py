@@ -0,0 +1,79 @@
+import pytest
+
+from geris.store import IssueStore
+
+ISSUES = [
+    {"number": 1, "title": "socket segfault", "body": "crash", "state": "open"},
+    {"number": 2, "title": "slow start", "body": "crash on start", "state": "open"},
+    {
+        "number": 3,
+        "title": "typo",
+        "body": "readme",
+        "state": "open",
+        "labels": [{"name": "Kind_Bug"}],
+        "assignees": [{"login": "a_b"}],
+    },
+    {
+        "number": 4,
+        "title": "docs",
+        "body": "readme",
+        "state": "open",
+        "labels": [{"name": "KindXBug"}],
+        "assignees": [{"login": "axb"}],
+    },
+    {
+        "number": 5,
+        "title": "more",
+        "body": "readme",
+        "state": "open",
+        "labels": [{"name": "100%"}],
+    },
+]
+
+
+@pytest.fixture
+def store():
+    store = IssueStore(":memory:")
+    store.save("o/r", None, ISSUES, [], [])
+    return store
+
+
+def numbers(rows):
+    return sorted(n["number"] for n in rows)
+
+
+@pytest.mark.parametrize(
+    "q, found",
+    [
+        ("crash", [1, 2]),
+        ("crash NOT segfault", [2]),
+        ("crash AND NOT segfault", [2]),
+        ("segfault OR start", [1, 2]),
+        ('"crash on"', [2]),
+        ("seg*", [1]),
+        ("crash?", [1, 2]),
+        ("-", []),
+    ],
+)
+def test_search(store, q, found):
+    assert numbers(store.search(q)) == found
+
+
+@pytest.mark.parametrize("q", ["NOT segfault", "crash OR NOT segfault"])
+def test_search_nothing_to_negate(store, q):
+    with pytest.raises(ValueError):
+        store.search(q)
+
+
+@pytest.mark.parametrize(
+    "where, found",
+    [
+        ({"label": "Kind_Bug"}, [3]),
+        ({"label": "KindXBug"}, [4]),
+        ({"label": "100%"}, [5]),
+        ({"label": "1%"}, []),
+        ({"assignee": "a_b"}, [3]),
+    ],
+)
+def test_filter_literal_names(store, where, found):
+    assert numbers(store.filter(**where)) == found